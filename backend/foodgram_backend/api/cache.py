@@ -0,0 +1,100 @@
+"""Кеш пользователь-независимой части представления рецептов.
+
+Сами представления хранятся в ограниченном по размеру локальном кеше
+процесса (settings.RECIPE_CACHE_ALIAS), а номера версий рецептов - в общем
+кеше по умолчанию, поэтому изменение рецепта в одном процессе сразу делает
+устаревшими записи во всех остальных.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+
+from core import metrics
+
+USER_FIELDS = ("is_favorited", "is_in_shopping_cart")
+
+_stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+def is_enabled():
+    return settings.RECIPE_CACHE_ENABLED
+
+
+def version_key(recipe_id):
+    return f"recipe-version:{recipe_id}"
+
+
+def data_key(recipe_id, version):
+    return f"recipe:{recipe_id}:{version}"
+
+
+def new_version():
+    return time.time_ns()
+
+
+def bump_versions(recipe_ids):
+    """Делает устаревшими закешированные представления рецептов."""
+    version = new_version()
+    cache.set_many(
+        {version_key(recipe_id): version for recipe_id in recipe_ids},
+        timeout=None,
+    )
+
+
+def get_versions(recipe_ids):
+    keys = {version_key(recipe_id): recipe_id for recipe_id in recipe_ids}
+    versions = {
+        keys[key]: version for key, version in cache.get_many(keys).items()
+    }
+    for recipe_id in set(recipe_ids) - set(versions):
+        cache.add(version_key(recipe_id), new_version(), timeout=None)
+        versions[recipe_id] = cache.get(version_key(recipe_id))
+    return versions
+
+
+def get_many(recipe_ids):
+    """Возвращает версии рецептов и найденные в кеше представления."""
+    versions = get_versions(recipe_ids)
+    keys = {
+        data_key(recipe_id, version): recipe_id
+        for recipe_id, version in versions.items()
+    }
+    found = {
+        keys[key]: data
+        for key, data in caches[settings.RECIPE_CACHE_ALIAS]
+        .get_many(keys)
+        .items()
+    }
+    with _stats_lock:
+        _stats["hits"] += len(found)
+        _stats["misses"] += len(recipe_ids) - len(found)
+    metrics.observe_cache("recipes", len(found), len(recipe_ids) - len(found))
+    return versions, found
+
+
+def strip_user_fields(data):
+    """Копия представления рецепта без пользовательских флагов."""
+    data = dict(data)
+    for field in USER_FIELDS:
+        data[field] = None
+    if isinstance(data.get("author"), dict):
+        data["author"] = dict(data["author"], is_subscribed=None)
+    return data
+
+
+def store(recipe_id, version, data):
+    """Сохраняет представление без пользовательских флагов."""
+    caches[settings.RECIPE_CACHE_ALIAS].set(
+        data_key(recipe_id, version), strip_user_fields(data)
+    )
+
+
+def get_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    requests = stats["hits"] + stats["misses"]
+    stats["hit_ratio"] = stats["hits"] / requests if requests else None
+    return stats
@@ -0,0 +1,147 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from api.utils import get_sparse_fields
+
+
+def deleted_key(model):
+    return f"deleted-at:{model._meta.label_lower}"
+
+
+def mark_deleted(model):
+    """Запоминает время удаления объекта модели для Last-Modified списка."""
+    cache.set(deleted_key(model), int(time.time()), timeout=None)
+
+
+def make_etag(*parts):
+    return quote_etag(
+        hashlib.md5("-".join(map(str, parts)).encode()).hexdigest()
+    )
+
+
+class ConditionalResponseMixin:
+    """Общая обработка условных GET-запросов."""
+    def get_etag_variant(self):
+        """Части ETag, от которых зависит тело ответа при тех же данных."""
+        return (self.request.accepted_renderer.format,)
+
+    def conditional_response(self, request, etag, last_modified, view):
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = view()
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+        patch_vary_headers(response, ("Accept", "Authorization"))
+        return response
+
+
+class ConditionalRetrieveMixin(ConditionalResponseMixin):
+    """Ответ 304 для неизмененного объекта по ETag/Last-Modified."""
+    def get_object_validators(self, instance):
+        last_modified = int(instance.updated_at.timestamp())
+        return (
+            make_etag(
+                instance.pk,
+                instance.updated_at.timestamp(),
+                *self.get_etag_variant(),
+            ),
+            last_modified,
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag, last_modified = self.get_object_validators(instance)
+        return self.conditional_response(
+            request,
+            etag,
+            last_modified,
+            lambda: Response(self.get_serializer(instance).data),
+        )
+
+
+class ConditionalListMixin(ConditionalResponseMixin):
+    """Ответ 304 для неизмененного списка по ETag/Last-Modified.
+
+    Валидаторы строятся по количеству объектов, самой поздней дате
+    изменения и времени последнего удаления.
+    """
+    def get_list_validators(self, queryset):
+        stats = queryset.order_by().aggregate(
+            total=Count("pk"), updated_at=Max("updated_at")
+        )
+        last_modified = cache.get(deleted_key(queryset.model), 0)
+        if stats["updated_at"] is not None:
+            last_modified = max(
+                last_modified, int(stats["updated_at"].timestamp())
+            )
+        etag = make_etag(
+            stats["total"],
+            stats["updated_at"] and stats["updated_at"].timestamp(),
+            last_modified,
+            *self.get_etag_variant(),
+        )
+        return etag, last_modified or None
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        etag, last_modified = self.get_list_validators(queryset)
+        return self.conditional_response(
+            request,
+            etag,
+            last_modified,
+            lambda: super(ConditionalListMixin, self).list(
+                request, *args, **kwargs
+            ),
+        )
+
+
+class CatalogSnapshotMixin:
+    """Отдает полный список справочника из готового снимка.
+
+    Снимок используется для JSON-ответа на запрос без параметров,
+    остальные запросы обрабатываются как обычно.
+    """
+    snapshot = None
+
+    def can_use_snapshot(self, request):
+        return (
+            request.accepted_renderer.format == "json"
+            and set(request.query_params) <= {"format"}
+        )
+
+    def list(self, request, *args, **kwargs):
+        if self.can_use_snapshot(request):
+            return self.snapshot.response(request)
+        return super().list(request, *args, **kwargs)
+
+
+class SparseFieldsViewMixin:
+    """Передает сериализатору поля из параметров ?fields= и ?expand=."""
+    sparse_actions = ("list", "retrieve")
+
+    def get_sparse_fields(self):
+        if self.action not in self.sparse_actions:
+            return None
+        if not hasattr(self, "_sparse_fields"):
+            self._sparse_fields = get_sparse_fields(self.request)
+        return self._sparse_fields
+
+    def get_sparse_columns(self, model, fields):
+        """Столбцы модели, соответствующие запрошенным полям."""
+        columns = {field.name for field in model._meta.concrete_fields}
+        return [name for name in fields if name in columns]
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            kwargs["fields"] = fields
+        return super().get_serializer(*args, **kwargs)
@@ -0,0 +1,67 @@
+import hashlib
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+from api.utils import is_flag_set
+
+CURSOR_PAGINATION_PARAM = "pagination"
+CURSOR_PAGINATION_VALUE = "cursor"
+COUNT_PARAM = "count"
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Курсорная пагинация ленты рецептов.
+
+    Включается параметром ?pagination=cursor (или наличием ?cursor=),
+    порядок совпадает с Recipe.Meta.ordering. Общее количество
+    рецептов считается только по запросу ?count=1 и кешируется.
+
+    Курсор DRF хранит только pub_date последнего рецепта и смещение
+    среди рецептов с той же датой, а не пару (pub_date, id): id лишь
+    упорядочивает рецепты с одинаковой датой.
+    """
+    ordering = ("-pub_date", "-id")
+    page_size_query_param = "limit"
+    max_page_size = 100
+
+    @classmethod
+    def is_requested(cls, request):
+        return (
+            request.query_params.get(CURSOR_PAGINATION_PARAM)
+            == CURSOR_PAGINATION_VALUE
+            or cls.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if is_flag_set(request, COUNT_PARAM):
+            self.count = self.get_cached_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_cached_count(self, queryset):
+        try:
+            sql, params = queryset.query.sql_with_params()
+        except EmptyResultSet:
+            # Заведомо пустая выборка: pk__in=[] или none().
+            return 0
+        key = "recipe-feed-count:" + hashlib.md5(
+            f"{sql}{params}".encode()
+        ).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, settings.RECIPE_FEED_COUNT_TIMEOUT)
+        return count
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ("count", self.count),
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data),
+        ]))
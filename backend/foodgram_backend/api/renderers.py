@@ -0,0 +1,105 @@
+import csv
+import json
+
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+LINE_SEPARATOR = "\u2028".encode()
+PARAGRAPH_SEPARATOR = "\u2029".encode()
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer на orjson с тем же результатом, что и у стандартного.
+
+    Даты и все типы, которые orjson не знает (Decimal, ленивые строки,
+    QuerySet), сериализуются JSONEncoder из DRF. Форматированный вывод
+    (indent) и все, что orjson сериализовать не смог, отдаются
+    стандартному JSONRenderer.
+    """
+    default = staticmethod(JSONEncoder().default)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if self.ensure_ascii or not self.compact or indent is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data, default=self.default, option=ORJSON_OPTIONS
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Как и JSONRenderer, экранируем разделители строк U+2028 и U+2029.
+        return ret.replace(LINE_SEPARATOR, b"\\u2028").replace(
+            PARAGRAPH_SEPARATOR, b"\\u2029"
+        )
+
+
+class Echo:
+    """Псевдо-буфер для csv.writer, возвращающий записанную строку."""
+    def write(self, value):
+        return value
+
+
+class ShoppingListRenderer(BaseRenderer):
+    """Базовый рендерер списка покупок.
+
+    Список - это кортежи (название, единица измерения, количество).
+    stream() подклассов выдает файл по частям для StreamingHttpResponse.
+    Ответы с ошибками (неизвестный формат, нет авторизации) отдаются
+    в JSON.
+    """
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get("response")
+        if (
+            response is not None and response.exception
+        ) or isinstance(data, (dict, str)):
+            if response is not None:
+                response["Content-Type"] = "application/json"
+            return ORJSONRenderer().render(data)
+        return "".join(self.stream(data)).encode(self.charset)
+
+
+class ShoppingListTextRenderer(ShoppingListRenderer):
+    media_type = "text/plain"
+    format = "txt"
+
+    def stream(self, ingredients):
+        yield "Список ингредиентов к покупке:\n"
+        for name, measurement_unit, amount in ingredients:
+            yield f"• {name} ({measurement_unit}) - {amount}\n"
+
+
+class ShoppingListCSVRenderer(ShoppingListRenderer):
+    media_type = "text/csv"
+    format = "csv"
+
+    def stream(self, ingredients):
+        writer = csv.writer(Echo())
+        yield writer.writerow(("name", "measurement_unit", "amount"))
+        for ingredient in ingredients:
+            yield writer.writerow(ingredient)
+
+
+class ShoppingListJSONRenderer(ShoppingListRenderer):
+    media_type = "application/json"
+    format = "json"
+
+    def stream(self, ingredients):
+        separator = "["
+        for name, measurement_unit, amount in ingredients:
+            yield separator + json.dumps(
+                {
+                    "name": name,
+                    "measurement_unit": measurement_unit,
+                    "amount": amount,
+                },
+                ensure_ascii=False,
+            )
+            separator = ","
+        yield "[]" if separator == "[" else "]"
@@ -1,11 +1,22 @@
 import base64
+from collections import defaultdict
+
 import djoser.serializers
+import orjson
+from django.conf import settings
 from django.core.files.base import ContentFile
+from django.db import DEFAULT_DB_ALIAS, models, transaction
+from django.db.models import prefetch_related_objects
 from django.shortcuts import get_object_or_404
 from rest_framework.exceptions import ValidationError
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
 
+from api import cache as recipe_cache
+from api.utils import FIELDS_PARAM, recipe_write
 from core import validators
+from core.db_router import use_primary
+from core.instrumentation import TimedListSerializer, TimedSerializerMixin
 from recipes.models import (
     Ingredient,
     Favorite,
@@ -15,11 +26,62 @@ from recipes.models import (
     Tag,
     TagRecipe,
     ShoppingCart,
+    recipe_prefetches,
 )
+from recipes.indexes import recipe_ingredient_index
+from recipes.similarity import mark_stale as mark_similar_stale
 from users.models import User
 
+MAX_AVAILABLE_INGREDIENTS = 500
+# Аннотации RecipeQuerySet.with_user_flags.
+USER_FLAGS = ("is_favorited", "is_in_shopping_cart", "author_is_subscribed")
+
+
+def unknown_fields_error(names):
+    return serializers.ValidationError(
+        {FIELDS_PARAM: [f"Неизвестные поля: {', '.join(names)}."]}
+    )
+
+
+def restrict_fields(serializer, tree, prefix=""):
+    """Оставляет в сериализаторе только поля из дерева tree.
+
+    Неизвестные поля приводят к ValidationError.
+    """
+    fields = serializer.fields
+    unknown = [f"{prefix}{name}" for name in tree if name not in fields]
+    if unknown:
+        raise unknown_fields_error(unknown)
+    for name in set(fields) - set(tree):
+        fields.pop(name)
+    for name, subtree in tree.items():
+        if subtree is None:
+            continue
+        field = fields[name]
+        field = getattr(field, "child", field)
+        if not isinstance(field, serializers.Serializer):
+            raise unknown_fields_error(
+                [f"{prefix}{name}.{nested}" for nested in subtree]
+            )
+        restrict_fields(field, subtree, f"{prefix}{name}.")
+
 
-class UserSerializer(djoser.serializers.UserSerializer):
+class SparseFieldsMixin:
+    """Сериализатор с выбором полей ответа.
+
+    fields - дерево полей из api.utils.parse_sparse_fields, вложенные
+    сериализаторы ограничиваются его поддеревьями.
+    """
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sparse_fields = fields
+        if fields is not None:
+            restrict_fields(self, fields)
+
+
+class UserSerializer(
+    SparseFieldsMixin, TimedSerializerMixin, djoser.serializers.UserSerializer
+):
     """Сериализатор для модели пользователей."""
     is_subscribed = serializers.SerializerMethodField()
 
@@ -33,8 +95,11 @@ class UserSerializer(djoser.serializers.UserSerializer):
             "last_name",
             "is_subscribed",
         )
+        list_serializer_class = TimedListSerializer
 
     def get_is_subscribed(self, instance):
+        if hasattr(instance, "is_subscribed"):
+            return instance.is_subscribed
         request = self.context.get("request")
         return (
             request
@@ -45,7 +110,9 @@ class UserSerializer(djoser.serializers.UserSerializer):
         )
 
 
-class UserCreateSerializer(djoser.serializers.UserCreateSerializer):
+class UserCreateSerializer(
+    TimedSerializerMixin, djoser.serializers.UserCreateSerializer
+):
     """Сериализатор для создания объектов пользователей."""
     class Meta:
         model = User
@@ -65,7 +132,7 @@ class UserCreateSerializer(djoser.serializers.UserCreateSerializer):
         return value
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериализатор для модели тегов."""
     class Meta:
         model = Tag
@@ -75,9 +142,10 @@ class TagSerializer(serializers.ModelSerializer):
             "color",
             "slug",
         )
+        list_serializer_class = TimedListSerializer
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериализатор для модели ингредиентов."""
     class Meta:
         model = Ingredient
@@ -86,6 +154,7 @@ class IngredientSerializer(serializers.ModelSerializer):
             "name",
             "measurement_unit",
         )
+        list_serializer_class = TimedListSerializer
 
 
 class TagRecipeSerializer(serializers.ModelSerializer):
@@ -123,7 +192,22 @@ class IngredientRecipeSerializer(serializers.ModelSerializer):
         )
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    """Сериализатор списка рецептов с общей загрузкой кеша."""
+    def to_representation(self, data):
+        if isinstance(data, models.Manager):
+            data = data.all()
+        recipes = list(data)
+        if self.child.uses_cards():
+            self.child.load_cards(recipes)
+        elif self.child.uses_cache():
+            self.child.load_cached(recipes)
+        return super().to_representation(recipes)
+
+
+class RecipeSerializer(
+    SparseFieldsMixin, TimedSerializerMixin, serializers.ModelSerializer
+):
     """Сериализатор для отображения рецептов."""
     tags = TagRecipeSerializer(many=True, source="tag_recipe")
     ingredients = IngredientRecipeSerializer(
@@ -148,8 +232,151 @@ class RecipeSerializer(serializers.ModelSerializer):
             "text",
             "cooking_time",
         )
+        list_serializer_class = RecipeListSerializer
+
+    def uses_cards(self):
+        return settings.RECIPE_CARDS_ENABLED and self.sparse_fields is None
+
+    def uses_cache(self):
+        # В кеше хранятся только полные представления рецептов.
+        return (
+            recipe_cache.is_enabled()
+            and self.sparse_fields is None
+            and not self.uses_cards()
+        )
+
+    @classmethod
+    def build_cards(cls, recipe_ids):
+        """Строит и сохраняет в Recipe.card карточки рецептов."""
+        serializer = cls()
+        cards = {}
+        with use_primary():
+            recipes = list(
+                Recipe.objects.filter(pk__in=recipe_ids)
+                .select_related("author")
+                .defer("search_vector", "card")
+                .with_related()
+            )
+        for recipe in recipes:
+            cards[recipe.pk] = orjson.dumps(recipe_cache.strip_user_fields(
+                super(RecipeSerializer, serializer).to_representation(recipe)
+            )).decode()
+            # Рецепт, измененный после чтения, остается с устаревшей
+            # карточкой до следующего обращения.
+            Recipe.objects.filter(
+                pk=recipe.pk, updated_at=recipe.updated_at
+            ).update(card=cards[recipe.pk])
+        return cards
+
+    def load_cards(self, recipes):
+        """Строит недостающие карточки рецептов одним набором запросов."""
+        stale = [recipe for recipe in recipes if recipe.card is None]
+        if stale:
+            cards = self.build_cards([recipe.pk for recipe in stale])
+            for recipe in stale:
+                recipe.card = cards.get(recipe.pk)
+
+    def card_representation(self, instance):
+        if instance.card is None:
+            self.load_cards([instance])
+        data = self.with_absolute_image(orjson.loads(instance.card))
+        data["is_favorited"] = self.get_is_favorited(instance)
+        data["is_in_shopping_cart"] = self.get_is_in_shopping_cart(instance)
+        if hasattr(instance, "author_is_subscribed"):
+            data["author"]["is_subscribed"] = instance.author_is_subscribed
+        else:
+            data["author"]["is_subscribed"] = self.fields[
+                "author"
+            ].get_is_subscribed(instance.author)
+        return data
+
+    def with_absolute_image(self, data):
+        """Представление с абсолютным адресом сохраненного пути картинки."""
+        request = self.context.get("request")
+        if request is not None and data["image"]:
+            data["image"] = request.build_absolute_uri(data["image"])
+        return data
+
+    def load_cached(self, recipes):
+        """Достает представления рецептов из кеша, а для остальных
+        одним набором запросов загружает связанные объекты.
+
+        Представления для кеша строятся по основной базе: прочитанный
+        из реплики рецепт может не содержать изменение, после которого
+        сменилась его версия.
+        """
+        versions, found = recipe_cache.get_many(
+            [recipe.pk for recipe in recipes]
+        )
+        missing = []
+        for recipe in recipes:
+            recipe.cache_version = versions[recipe.pk]
+            recipe.cached_data = found.get(recipe.pk)
+            recipe.cache_source = recipe
+            if recipe.cached_data is None:
+                missing.append(recipe)
+        replicated = [
+            recipe
+            for recipe in missing
+            if recipe._state.db != DEFAULT_DB_ALIAS
+        ]
+        with use_primary():
+            if replicated:
+                primary = (
+                    Recipe.objects.select_related("author")
+                    .defer("search_vector", "card")
+                    .in_bulk([recipe.pk for recipe in replicated])
+                )
+                for recipe in replicated:
+                    source = primary.get(recipe.pk)
+                    if source is None:
+                        continue
+                    for flag in USER_FLAGS:
+                        if hasattr(recipe, flag):
+                            setattr(source, flag, getattr(recipe, flag))
+                    if hasattr(source, "author_is_subscribed"):
+                        source.author.is_subscribed = (
+                            source.author_is_subscribed
+                        )
+                    recipe.cache_source = source
+            prefetch_related_objects(
+                [recipe.cache_source for recipe in missing],
+                *recipe_prefetches(),
+            )
+
+    def to_representation(self, instance):
+        if self.uses_cards():
+            return self.card_representation(instance)
+        if "author" in self.fields and hasattr(
+            instance, "author_is_subscribed"
+        ):
+            instance.author.is_subscribed = instance.author_is_subscribed
+        if not self.uses_cache():
+            return super().to_representation(instance)
+        if not hasattr(instance, "cached_data"):
+            self.load_cached([instance])
+        if instance.cached_data is None:
+            data = super().to_representation(instance.cache_source)
+            # Адрес картинки зависит от запроса, поэтому в кеше
+            # хранится путь, как в карточке.
+            image = instance.cache_source.image
+            recipe_cache.store(
+                instance.pk,
+                instance.cache_version,
+                dict(data, image=image.url if image else None),
+            )
+            return data
+        data = self.with_absolute_image(instance.cached_data)
+        data["is_favorited"] = self.get_is_favorited(instance)
+        data["is_in_shopping_cart"] = self.get_is_in_shopping_cart(instance)
+        data["author"]["is_subscribed"] = self.fields[
+            "author"
+        ].get_is_subscribed(instance.author)
+        return data
 
     def get_is_favorited(self, instance):
+        if hasattr(instance, "is_favorited"):
+            return instance.is_favorited
         request = self.context.get("request")
         return (
             request
@@ -161,6 +388,8 @@ class RecipeSerializer(serializers.ModelSerializer):
         )
 
     def get_is_in_shopping_cart(self, instance):
+        if hasattr(instance, "is_in_shopping_cart"):
+            return instance.is_in_shopping_cart
         request = self.context.get("request")
         return (
             request
@@ -174,10 +403,53 @@ class RecipeSerializer(serializers.ModelSerializer):
         )
 
 
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """Список связанных объектов, загружаемых одним запросом."""
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self.child_relation.preload(data)
+        return super().to_internal_value(data)
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Поле первичного ключа с предварительной загрузкой объектов."""
+    preloaded = None
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {"child_relation": cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+    def preload(self, pks):
+        self.preloaded = self.get_queryset().in_bulk(
+            [pk for pk in pks if str(pk).isdigit()]
+        )
+
+    def to_internal_value(self, data):
+        if self.preloaded is not None and str(data).isdigit():
+            instance = self.preloaded.get(int(data))
+            if instance is not None:
+                return instance
+        return super().to_internal_value(data)
+
+
+class IngredientRecipeCreateListSerializer(serializers.ListSerializer):
+    """Список ингредиентов рецепта, загружаемых одним запросом."""
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self.child.fields["id"].preload(
+                [item.get("id") for item in data if isinstance(item, dict)]
+            )
+        return super().to_internal_value(data)
+
+
 class IngredientRecipeCreateSerializer(serializers.ModelSerializer):
     """Сериализатор для создания объектов
     связанной модели ингредиентов и рецептов."""
-    id = serializers.PrimaryKeyRelatedField(
+    id = BulkPrimaryKeyRelatedField(
         source="ingredient",
         queryset=Ingredient.objects.all(),
     )
@@ -194,6 +466,7 @@ class IngredientRecipeCreateSerializer(serializers.ModelSerializer):
             "measurement_unit",
             "amount",
         )
+        list_serializer_class = IngredientRecipeCreateListSerializer
 
 
 class Base64ImageField(serializers.ImageField):
@@ -208,14 +481,16 @@ class Base64ImageField(serializers.ImageField):
         return super().to_internal_value(data)
 
 
-class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
+class RecipeCreateUpdateSerializer(
+    TimedSerializerMixin, serializers.ModelSerializer
+):
     """Сериализатор для создания рецептов."""
     ingredients = IngredientRecipeCreateSerializer(
         many=True, source="ingredient_recipe"
     )
     image = Base64ImageField(required=False, allow_null=True)
     author = UserSerializer(read_only=True)
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = BulkPrimaryKeyRelatedField(
         many=True, queryset=Tag.objects.all()
     )
 
@@ -231,64 +506,124 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
             "cooking_time",
         )
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop("ingredient_recipe")
         tags = validated_data.pop("tags")
         instance = super().create(validated_data)
-        for tag in tags:
-            TagRecipe(tag=Tag.objects.get(id=tag.id), recipe=instance).save()
-        for ingredient_data in ingredients:
+        TagRecipe.objects.bulk_create(
+            TagRecipe(tag=tag, recipe=instance) for tag in tags
+        )
+        IngredientRecipe.objects.bulk_create(
             IngredientRecipe(
                 recipe=instance,
                 ingredient=ingredient_data["ingredient"],
                 amount=ingredient_data["amount"],
-            ).save()
+            )
+            for ingredient_data in ingredients
+        )
+        if settings.RECIPE_CARDS_ENABLED:
+            RecipeSerializer.build_cards([instance.pk])
+        mark_similar_stale([instance.pk])
+        recipe_ingredient_index.changed([instance.pk])
         return instance
 
     def to_representation(self, instance):
+        prefetch_related_objects([instance], *recipe_prefetches())
         representation = super(
             RecipeCreateUpdateSerializer, self
         ).to_representation(
             instance
         )
         representation["tags"] = TagSerializer(
-            instance.tags.all(), many=True
+            [tag_recipe.tag for tag_recipe in instance.tag_recipe.all()],
+            many=True,
         ).data
         return representation
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.pop("tags")
         ingredients = validated_data.pop("ingredient_recipe")
-        instance.ingredients.clear()
-        new_tags = []
-        for tag in tags:
-            new_tags.append(tag.id)
-        instance.tags.set(new_tags)
+        with recipe_write():
+            self.update_tags(instance, tags)
+            self.update_ingredients(instance, ingredients)
+        instance._prefetched_objects_cache = {}
+        instance = super().update(instance, validated_data)
+        if settings.RECIPE_CARDS_ENABLED:
+            RecipeSerializer.build_cards([instance.pk])
+        mark_similar_stale([instance.pk])
+        recipe_ingredient_index.changed([instance.pk])
+        return instance
+
+    def update_tags(self, instance, tags):
+        """Добавляет и удаляет только изменившиеся теги рецепта."""
+        current = set(instance.tag_recipe.values_list("tag_id", flat=True))
+        new = {tag.id for tag in tags}
+        if current - new:
+            instance.tag_recipe.filter(tag_id__in=current - new).delete()
+        TagRecipe.objects.bulk_create(
+            TagRecipe(tag=tag, recipe=instance)
+            for tag in tags if tag.id not in current
+        )
+
+    def update_ingredients(self, instance, ingredients):
+        """Добавляет, изменяет и удаляет только изменившиеся ингредиенты."""
+        current = {
+            ingredient_recipe.ingredient_id: ingredient_recipe
+            for ingredient_recipe in instance.ingredient_recipe.all()
+        }
+        to_create = []
+        to_update = []
         for ingredient_data in ingredients:
-            IngredientRecipe.objects.update_or_create(
-                recipe=instance,
-                ingredient=ingredient_data["ingredient"],
-                amount=ingredient_data["amount"],
+            ingredient_recipe = current.pop(
+                ingredient_data["ingredient"].id, None
             )
-        return super().update(instance, validated_data)
+            if ingredient_recipe is None:
+                to_create.append(IngredientRecipe(
+                    recipe=instance,
+                    ingredient=ingredient_data["ingredient"],
+                    amount=ingredient_data["amount"],
+                ))
+            elif ingredient_recipe.amount != ingredient_data["amount"]:
+                ingredient_recipe.amount = ingredient_data["amount"]
+                to_update.append(ingredient_recipe)
+        if current:
+            IngredientRecipe.objects.filter(
+                pk__in=[row.pk for row in current.values()]
+            ).delete()
+        IngredientRecipe.objects.bulk_create(to_create)
+        IngredientRecipe.objects.bulk_update(to_update, ("amount",))
 
     def validate(self, attrs):
         if len(attrs["tags"]) < 1:
-            return ValidationError("Не выбрано ни одного тега.")
+            raise ValidationError("Не выбрано ни одного тега.")
         if len(set(attrs["tags"])) != len(attrs["tags"]):
-            return ValidationError("Теги дублируются.")
+            raise ValidationError("Теги дублируются.")
         if len(attrs["ingredient_recipe"]) < 1:
-            return ValidationError("Не указан ни один ингредиент.")
+            raise ValidationError("Не указан ни один ингредиент.")
         ingredients = [
             ingredient["ingredient"].id for ingredient in
             attrs["ingredient_recipe"]
         ]
         if len(set(ingredients)) != (len(attrs["ingredient_recipe"])):
-            return ValidationError("Ингредиенты дублируются.")
+            raise ValidationError("Ингредиенты дублируются.")
         return super().validate(attrs)
 
 
-class FollowCreateDeleteSerializer(serializers.ModelSerializer):
+class CookableSerializer(serializers.Serializer):
+    """Ингредиенты, которые есть у пользователя."""
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_AVAILABLE_INGREDIENTS,
+    )
+    max_missing = serializers.IntegerField(min_value=0, required=False)
+
+
+class FollowCreateDeleteSerializer(
+    TimedSerializerMixin, serializers.ModelSerializer
+):
     """Сериализатор для подписок на пользователей/отписок."""
     user = serializers.ReadOnlyField(source="follow.user")
     following = serializers.ReadOnlyField(source="follow.following")
@@ -338,7 +673,24 @@ class RecipeInFollowSerializer(serializers.ModelSerializer):
         )
 
 
-class FollowSerializer(serializers.ModelSerializer):
+class FollowListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    """Список подписок с загрузкой рецептов всех авторов одним запросом."""
+    def to_representation(self, data):
+        if isinstance(data, models.Manager):
+            data = data.all()
+        follows = list(data)
+        recipes = defaultdict(list)
+        for recipe in Recipe.objects.latest_for_authors(
+            [follow.following_id for follow in follows],
+            self.child.get_recipes_limit(),
+        ).only("id", "name", "image", "cooking_time", "author_id"):
+            recipes[recipe.author_id].append(recipe)
+        for follow in follows:
+            follow.recipes = recipes[follow.following_id]
+        return super().to_representation(follows)
+
+
+class FollowSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Сериализатор для отображения подписок."""
     email = serializers.ReadOnlyField(source="following.email")
     id = serializers.ReadOnlyField(source="following.id")
@@ -361,23 +713,36 @@ class FollowSerializer(serializers.ModelSerializer):
             "recipes",
             "recipes_count",
         )
+        list_serializer_class = FollowListSerializer
+
+    def get_recipes_limit(self):
+        request = self.context.get("request")
+        limit = request and request.query_params.get("recipes_limit")
+        if limit and limit.isdigit() and int(limit) > 0:
+            return int(limit)
+        return None
 
     def get_is_subscribed(self, instance):
-        return Follow.objects.filter(
-            user=instance.user, following=instance.following
-        ).exists()
+        # Сам объект подписки означает, что подписка существует.
+        return instance.pk is not None
 
     def get_recipes_count(self, instance):
-        return Recipe.objects.filter(author=instance.following).count()
+        return instance.following.recipes_count
 
     def get_recipes(self, instance):
-        recipes = Recipe.objects.filter(author=instance.following)
+        recipes = getattr(instance, "recipes", None)
+        if recipes is None:
+            recipes = Recipe.objects.latest_for_authors(
+                [instance.following_id]
+            )[:self.get_recipes_limit()]
         return RecipeInFollowSerializer(
             recipes, many=True, context=self.context
         ).data
 
 
-class FavoriteCreateDeleteSerializer(serializers.ModelSerializer):
+class FavoriteCreateDeleteSerializer(
+    TimedSerializerMixin, serializers.ModelSerializer
+):
     """Сериализатор для создания и удаления избранного."""
     user = serializers.ReadOnlyField(source="favorite.user")
     recipe = serializers.ReadOnlyField(source="favorite.recipe")
@@ -413,7 +778,9 @@ class FavoriteCreateDeleteSerializer(serializers.ModelSerializer):
         return super().validate(attrs)
 
 
-class CartAddDeleteSerializer(serializers.ModelSerializer):
+class CartAddDeleteSerializer(
+    TimedSerializerMixin, serializers.ModelSerializer
+):
     """Сериализатор для создания и удаления рецептов в корзине."""
     user = serializers.ReadOnlyField(source="shoppingcart.user")
     recipe = serializers.SerializerMethodField()
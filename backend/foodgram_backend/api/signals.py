@@ -0,0 +1,142 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from api import cache as recipe_cache
+from api.mixins import mark_deleted
+from api.snapshots import ingredient_snapshot, tag_snapshot
+from api.utils import in_recipe_write
+from recipes import similarity
+from recipes.indexes import recipe_ingredient_index
+from recipes.models import (
+    Ingredient,
+    IngredientRecipe,
+    Recipe,
+    Tag,
+    TagRecipe,
+)
+
+User = get_user_model()
+
+# Поля пользователя, которые не входят в представление рецепта.
+USER_SERVICE_FIELDS = frozenset(
+    ("last_login", "password", "recipes_count", "followers_count")
+)
+# Поля рецепта, которые не входят в его карточку.
+RECIPE_SERVICE_FIELDS = frozenset(
+    ("favorites_count", "search_vector", "card")
+)
+
+
+def invalidate_recipes(recipe_ids):
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        transaction.on_commit(
+            lambda: recipe_cache.bump_versions(recipe_ids)
+        )
+
+
+def touch_recipes(recipe_ids):
+    """Обновляет дату изменения рецептов при изменении связанных данных."""
+    if in_recipe_write():
+        return
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        Recipe.objects.filter(pk__in=recipe_ids).update(
+            updated_at=timezone.now(), card=None
+        )
+        invalidate_recipes(recipe_ids)
+
+
+def update_similar(recipe_ids):
+    """Отмечает для пересчета похожие рецепты при изменении связей."""
+    if in_recipe_write():
+        return
+    similarity.mark_stale(recipe_ids)
+
+
+def update_ingredient_index(recipe_ids):
+    """Записывает изменение ингредиентов рецептов в журнал индекса."""
+    if in_recipe_write():
+        return
+    recipe_ingredient_index.changed(recipe_ids)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, update_fields, **kwargs):
+    if not created and not (
+        update_fields and RECIPE_SERVICE_FIELDS >= update_fields
+    ):
+        # save() записывает в card прочитанное вместе с рецептом значение.
+        Recipe.objects.filter(pk=instance.pk).update(card=None)
+    invalidate_recipes([instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    invalidate_recipes([instance.pk])
+    # Удаленные вместе с рецептом ингредиенты попадают в ту же запись.
+    update_ingredient_index([instance.pk])
+
+
+@receiver(post_save, sender=IngredientRecipe)
+@receiver(post_delete, sender=IngredientRecipe)
+@receiver(post_save, sender=TagRecipe)
+@receiver(post_delete, sender=TagRecipe)
+def recipe_relation_changed(sender, instance, **kwargs):
+    touch_recipes([instance.recipe_id])
+    update_similar([instance.recipe_id])
+    if sender is IngredientRecipe:
+        update_ingredient_index([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=IngredientRecipe)
+@receiver(m2m_changed, sender=TagRecipe)
+def recipe_relations_changed(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    if not action.startswith("post_"):
+        return
+    recipe_ids = [instance.pk] if not reverse else pk_set
+    if not recipe_ids:
+        return
+    touch_recipes(recipe_ids)
+    update_similar(recipe_ids)
+    if sender is IngredientRecipe:
+        update_ingredient_index(recipe_ids)
+
+
+@receiver(post_save, sender=Tag)
+def tag_changed(sender, instance, created, **kwargs):
+    tag_snapshot.invalidate()
+    if not created:
+        touch_recipes(
+            instance.tag_recipe.values_list("recipe_id", flat=True)
+        )
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_changed(sender, instance, created, **kwargs):
+    ingredient_snapshot.invalidate()
+    if not created:
+        touch_recipes(
+            instance.ingredient_recipe.values_list("recipe_id", flat=True)
+        )
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, created, update_fields, **kwargs):
+    if created or (update_fields and USER_SERVICE_FIELDS >= update_fields):
+        return
+    touch_recipes(instance.recipes.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def catalog_item_deleted(sender, **kwargs):
+    mark_deleted(sender)
+    if sender is Tag:
+        tag_snapshot.invalidate()
+    else:
+        ingredient_snapshot.invalidate()
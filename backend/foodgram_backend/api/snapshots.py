@@ -0,0 +1,115 @@
+"""Готовые сжатые ответы для полных списков справочников.
+
+Список сериализуется один раз на версию справочника и хранится в памяти
+процесса вместе с gzip- и brotli-вариантами. Версия сбрасывается
+сигналами при изменении тегов и ингредиентов.
+"""
+import gzip
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Max
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from api.mixins import deleted_key
+from api.renderers import ORJSONRenderer
+from api.serializers import IngredientSerializer, TagSerializer
+from core.indexes import VersionedIndex
+from recipes.models import Ingredient, Tag
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+IDENTITY = "identity"
+# Предпочитаемые кодировки по убыванию степени сжатия.
+ENCODINGS = ("br", "gzip")
+
+
+def accepted_encodings(request):
+    """Кодировки из Accept-Encoding с ненулевым q."""
+    result = set()
+    for part in request.META.get("HTTP_ACCEPT_ENCODING", "").split(","):
+        coding, *params = (item.strip() for item in part.split(";"))
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding and quality > 0:
+            result.add(coding.lower())
+    return result
+
+
+class CatalogSnapshot(VersionedIndex):
+    """Снимок полного списка справочника в виде готового JSON."""
+    def __init__(self, name, model, serializer_class):
+        super().__init__()
+        self.version_key = f"catalog-snapshot-version:{name}"
+        self.model = model
+        self.serializer_class = serializer_class
+
+    def build(self):
+        body = ORJSONRenderer().render(
+            self.serializer_class(self.model.objects.all(), many=True).data
+        )
+        bodies = {IDENTITY: body, "gzip": gzip.compress(body, 9, mtime=0)}
+        if brotli is not None:
+            bodies["br"] = brotli.compress(body, quality=11)
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        updated_at = self.model.objects.aggregate(
+            updated_at=Max("updated_at")
+        )["updated_at"]
+        last_modified = cache.get(deleted_key(self.model), 0)
+        if updated_at is not None:
+            last_modified = max(last_modified, int(updated_at.timestamp()))
+        return {
+            "bodies": bodies,
+            "last_modified": last_modified or None,
+            "etags": {
+                encoding: f'"{digest}"'
+                if encoding == IDENTITY
+                else f'"{digest}-{encoding}"'
+                for encoding in bodies
+            },
+        }
+
+    def response(self, request):
+        data = self.get()
+        accepted = accepted_encodings(request)
+        encoding = next(
+            (
+                encoding
+                for encoding in ENCODINGS
+                if encoding in data["bodies"]
+                and (encoding in accepted or "*" in accepted)
+            ),
+            IDENTITY,
+        )
+        etag = data["etags"][encoding]
+        response = get_conditional_response(
+            request, etag=etag, last_modified=data["last_modified"]
+        )
+        if response is None:
+            response = HttpResponse(
+                data["bodies"][encoding], content_type="application/json"
+            )
+            if encoding != IDENTITY:
+                response["Content-Encoding"] = encoding
+        response["ETag"] = etag
+        if data["last_modified"] is not None:
+            response["Last-Modified"] = http_date(data["last_modified"])
+        patch_vary_headers(response, ("Accept-Encoding",))
+        return response
+
+
+ingredient_snapshot = CatalogSnapshot(
+    "ingredients", Ingredient, IngredientSerializer
+)
+tag_snapshot = CatalogSnapshot("tags", Tag, TagSerializer)
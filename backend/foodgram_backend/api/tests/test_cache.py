@@ -0,0 +1,92 @@
+from django.core.cache import cache, caches
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api import cache as recipe_cache
+from recipes.models import (
+    Ingredient,
+    IngredientRecipe,
+    Recipe,
+    Tag,
+    TagRecipe,
+)
+from users.models import User
+
+
+@override_settings(RECIPE_CACHE_ENABLED=True, RECIPE_CARDS_ENABLED=False)
+class RecipeCacheTest(TestCase):
+    """Изменение рецепта и связанных данных меняет версию в кеше."""
+    def setUp(self):
+        cache.clear()
+        caches["recipes"].clear()
+        self.author = User.objects.create_user(
+            username="author", email="author@example.com"
+        )
+        self.tag = Tag.objects.create(
+            name="Суп", color="#000000", slug="soup"
+        )
+        self.ingredient = Ingredient.objects.create(
+            name="Соль", measurement_unit="г"
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.author, name="Борщ", cooking_time=5
+        )
+        TagRecipe.objects.create(recipe=self.recipe, tag=self.tag)
+        IngredientRecipe.objects.create(
+            recipe=self.recipe, ingredient=self.ingredient, amount=10
+        )
+        self.client = APIClient()
+        self.url = f"/api/recipes/{self.recipe.pk}/"
+
+    def version(self):
+        return recipe_cache.get_versions([self.recipe.pk])[self.recipe.pk]
+
+    def assertVersionChanged(self, change):
+        version = self.version()
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        self.assertNotEqual(self.version(), version)
+
+    def test_recipe_saved(self):
+        self.recipe.name = "Щи"
+        self.assertVersionChanged(self.recipe.save)
+
+    def test_recipe_deleted(self):
+        self.assertVersionChanged(self.recipe.delete)
+
+    def test_tag_changed(self):
+        self.tag.name = "Супы"
+        self.assertVersionChanged(self.tag.save)
+
+    def test_tag_deleted(self):
+        self.assertVersionChanged(self.tag.delete)
+
+    def test_ingredient_changed(self):
+        self.ingredient.measurement_unit = "кг"
+        self.assertVersionChanged(self.ingredient.save)
+
+    def test_author_changed(self):
+        self.author.first_name = "Иван"
+        self.assertVersionChanged(self.author.save)
+
+    def test_author_service_fields_keep_version(self):
+        version = self.version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.save(update_fields=["last_login"])
+        self.assertEqual(self.version(), version)
+
+    def test_changed_recipe_is_not_served_from_cache(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.name = "Щи"
+            self.recipe.save()
+        self.assertEqual(self.client.get(self.url).json()["name"], "Щи")
+
+    def test_stats(self):
+        before = recipe_cache.get_stats()
+        self.client.get(self.url)
+        self.client.get(self.url)
+        stats = recipe_cache.get_stats()
+        self.assertEqual(stats["misses"] - before["misses"], 1)
+        self.assertEqual(stats["hits"] - before["hits"], 1)
+        self.assertGreater(stats["hit_ratio"], 0)
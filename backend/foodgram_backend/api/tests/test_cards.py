@@ -0,0 +1,121 @@
+import json
+
+from django.core.cache import cache, caches
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes.models import (
+    Favorite,
+    Follow,
+    Ingredient,
+    IngredientRecipe,
+    Recipe,
+    ShoppingCart,
+    Tag,
+    TagRecipe,
+)
+from users.models import User
+
+
+@override_settings(RECIPE_CARDS_ENABLED=True, RECIPE_CACHE_ENABLED=False)
+class RecipeCardTest(TestCase):
+    """Карточка рецепта сбрасывается при изменении связанных данных."""
+    def setUp(self):
+        cache.clear()
+        caches["recipes"].clear()
+        self.author = User.objects.create_user(
+            username="author", email="author@example.com"
+        )
+        self.user = User.objects.create_user(
+            username="user", email="user@example.com"
+        )
+        self.tag = Tag.objects.create(
+            name="Суп", color="#000000", slug="soup"
+        )
+        self.ingredient = Ingredient.objects.create(
+            name="Соль", measurement_unit="г"
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.author, name="Борщ", cooking_time=5
+        )
+        TagRecipe.objects.create(recipe=self.recipe, tag=self.tag)
+        IngredientRecipe.objects.create(
+            recipe=self.recipe, ingredient=self.ingredient, amount=10
+        )
+        self.url = f"/api/recipes/{self.recipe.pk}/"
+        self.anonymous = APIClient()
+        self.authenticated = APIClient()
+        self.authenticated.force_authenticate(self.user)
+
+    def card(self):
+        card = Recipe.objects.values_list("card", flat=True).get(
+            pk=self.recipe.pk
+        )
+        return card and json.loads(card)
+
+    def get(self, client=None):
+        response = (client or self.anonymous).get(self.url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def assertRebuilt(self, change):
+        """Проверяет, что change() сбрасывает карточку, и возвращает
+        новое представление рецепта."""
+        self.get()
+        self.assertIsNotNone(self.card())
+        change()
+        self.assertIsNone(self.card())
+        data = self.get()
+        self.assertEqual(self.card()["name"], data["name"])
+        return data
+
+    def test_tag_changed(self):
+        def change():
+            self.tag.name = "Супы"
+            self.tag.save()
+
+        data = self.assertRebuilt(change)
+        self.assertEqual(data["tags"][0]["name"], "Супы")
+
+    def test_ingredient_changed(self):
+        def change():
+            self.ingredient.measurement_unit = "кг"
+            self.ingredient.save()
+
+        data = self.assertRebuilt(change)
+        self.assertEqual(data["ingredients"][0]["measurement_unit"], "кг")
+
+    def test_author_changed(self):
+        def change():
+            self.author.first_name = "Иван"
+            self.author.save()
+
+        data = self.assertRebuilt(change)
+        self.assertEqual(data["author"]["first_name"], "Иван")
+
+    def test_author_service_fields_keep_card(self):
+        self.get()
+        card = self.card()
+        self.author.save(update_fields=["last_login"])
+        self.assertEqual(self.card(), card)
+
+    def test_user_flags_are_not_stored(self):
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+        ShoppingCart.objects.create(user=self.user, recipe=self.recipe)
+        Follow.objects.create(user=self.user, following=self.author)
+        # Карточку строит запрос пользователя с установленными флагами.
+        data = self.get(self.authenticated)
+        self.assertTrue(data["is_favorited"])
+        self.assertTrue(data["is_in_shopping_cart"])
+        self.assertTrue(data["author"]["is_subscribed"])
+        card = self.card()
+        self.assertIsNone(card["is_favorited"])
+        self.assertIsNone(card["is_in_shopping_cart"])
+        self.assertIsNone(card["author"]["is_subscribed"])
+        data = self.get()
+        self.assertFalse(data["is_favorited"])
+        self.assertFalse(data["is_in_shopping_cart"])
+        self.assertFalse(data["author"]["is_subscribed"])
+        data = self.authenticated.get("/api/recipes/").json()["results"][0]
+        self.assertTrue(data["is_favorited"])
+        self.assertTrue(data["author"]["is_subscribed"])
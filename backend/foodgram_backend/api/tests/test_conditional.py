@@ -0,0 +1,104 @@
+from django.core.cache import cache, caches
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Favorite, Ingredient, Recipe, Tag
+from users.models import User
+
+
+class ConditionalGetTest(TestCase):
+    """Ответ 304 по ETag и Last-Modified для неизмененных данных."""
+    def setUp(self):
+        cache.clear()
+        caches["recipes"].clear()
+        self.user = User.objects.create_user(
+            username="user", email="user@example.com"
+        )
+        self.tag = Tag.objects.create(
+            name="Суп", color="#000000", slug="soup"
+        )
+        self.ingredient = Ingredient.objects.create(
+            name="Соль", measurement_unit="г"
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.user, name="Борщ", cooking_time=5
+        )
+        self.anonymous = APIClient()
+        self.authenticated = APIClient()
+        self.authenticated.force_authenticate(self.user)
+
+    def assertNotModified(self, url, client=None):
+        """Проверяет 304 на повторный запрос и возвращает ETag."""
+        client = client or self.anonymous
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        etag = response["ETag"]
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        return etag
+
+    def assertModified(self, url, etag, client=None):
+        client = client or self.anonymous
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_last_modified(self):
+        for url in (
+            f"/api/tags/{self.tag.pk}/",
+            f"/api/ingredients/{self.ingredient.pk}/",
+            "/api/ingredients/?name=Со",
+            f"/api/recipes/{self.recipe.pk}/",
+        ):
+            with self.subTest(url=url):
+                last_modified = self.anonymous.get(url)["Last-Modified"]
+                response = self.anonymous.get(
+                    url, HTTP_IF_MODIFIED_SINCE=last_modified
+                )
+                self.assertEqual(response.status_code, 304)
+
+    def test_tag_changed(self):
+        url = f"/api/tags/{self.tag.pk}/"
+        etag = self.assertNotModified(url)
+        self.tag.name = "Супы"
+        self.tag.save()
+        self.assertModified(url, etag)
+
+    def test_ingredients_changed(self):
+        url = "/api/ingredients/?name=Со"
+        etag = self.assertNotModified(url)
+        Ingredient.objects.create(name="Сок", measurement_unit="мл")
+        self.assertModified(url, etag)
+        etag = self.assertNotModified(url)
+        self.ingredient.delete()
+        self.assertModified(url, etag)
+
+    def test_recipe_changed(self):
+        url = f"/api/recipes/{self.recipe.pk}/"
+        etag = self.assertNotModified(url)
+        self.recipe.name = "Щи"
+        self.recipe.save()
+        self.assertModified(url, etag)
+
+    def test_favorite_changes_etag(self):
+        url = f"/api/recipes/{self.recipe.pk}/"
+        etag = self.assertNotModified(url, self.authenticated)
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+        self.assertModified(url, etag, self.authenticated)
+        self.assertNotIn("Last-Modified", self.authenticated.get(url))
+
+    def test_etag_depends_on_representation(self):
+        url = f"/api/recipes/{self.recipe.pk}/"
+        etags = {
+            self.assertNotModified(url + query)
+            for query in (
+                "",
+                "?fields=id",
+                "?fields=id,name",
+                "?fields=id&expand=author",
+                "?format=api",
+            )
+        }
+        self.assertEqual(len(etags), 5)
+        self.assertIn("Accept", self.anonymous.get(url)["Vary"])
@@ -0,0 +1,123 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.indexes import recipe_ingredient_index
+from recipes.models import Ingredient, IngredientRecipe, Recipe, Tag
+from users.models import User
+
+URL = "/api/recipes/cookable/"
+
+
+class CookableTest(TestCase):
+    """Рецепты из имеющихся ингредиентов по индексу и запросом к базе."""
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            username="author", email="author@example.com"
+        )
+        self.tag = Tag.objects.create(
+            name="Суп", color="#000000", slug="soup"
+        )
+        self.ingredients = [
+            Ingredient.objects.create(
+                name=f"Ингредиент {number}", measurement_unit="г"
+            )
+            for number in range(4)
+        ]
+        self.recipes = []
+        for number in range(3):
+            recipe = Recipe.objects.create(
+                author=self.author, name=f"Рецепт {number}", cooking_time=5
+            )
+            for ingredient in self.ingredients[number:number + 2]:
+                IngredientRecipe.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=1
+                )
+            self.recipes.append(recipe)
+        # Индекс процесса перестраивается по данным теста сразу, а не
+        # в фоне при первом запросе.
+        recipe_ingredient_index._checked_at = 0.0
+        recipe_ingredient_index.get()
+        self.client = APIClient()
+
+    def cookable(self, ingredients, **params):
+        response = self.client.post(
+            URL,
+            {"ingredients": [item.pk for item in ingredients], **params},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        return [
+            (
+                recipe["id"],
+                recipe["missing_ingredients"],
+                recipe["matched_ingredients"],
+            )
+            for recipe in response.json()["results"]
+        ]
+
+    def assertCookable(self, ingredients, expected, **params):
+        self.assertEqual(self.cookable(ingredients, **params), expected)
+        # Пока индекс строится, рецепты подбираются запросом к базе.
+        with mock.patch.object(
+            recipe_ingredient_index, "get", return_value=None
+        ):
+            self.assertEqual(self.cookable(ingredients, **params), expected)
+
+    def test_cookable(self):
+        first, second, _ = self.recipes
+        self.assertCookable(
+            self.ingredients[:2], [(first.pk, 0, 2), (second.pk, 1, 1)]
+        )
+
+    def test_max_missing(self):
+        self.assertCookable(
+            self.ingredients[:2], [(self.recipes[0].pk, 0, 2)], max_missing=0
+        )
+
+    def test_nothing_matches(self):
+        other = Ingredient.objects.create(name="Соль", measurement_unit="г")
+        self.assertCookable([other], [])
+
+    def test_invalid(self):
+        for data in ({}, {"ingredients": []}, {"ingredients": [0]}):
+            with self.subTest(data=data):
+                response = self.client.post(URL, data, format="json")
+                self.assertEqual(response.status_code, 400)
+
+    def test_update_logs_one_change(self):
+        recipe = self.recipes[0]
+        self.client.force_authenticate(self.author)
+        position = recipe_ingredient_index.current_position()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f"/api/recipes/{recipe.pk}/",
+                {
+                    "name": recipe.name,
+                    "text": "Текст",
+                    "cooking_time": 5,
+                    "tags": [self.tag.pk],
+                    "ingredients": [
+                        {"id": ingredient.pk, "amount": 2}
+                        for ingredient in self.ingredients[2:]
+                    ],
+                },
+                format="json",
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(
+            recipe_ingredient_index.current_position(), position + 1
+        )
+        recipe_ingredient_index._checked_at = 0.0
+        self.assertEqual(self.cookable(self.ingredients[:1]), [])
+
+    def test_delete_logs_one_change(self):
+        position = recipe_ingredient_index.current_position()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipes[0].delete()
+        self.assertEqual(
+            recipe_ingredient_index.current_position(), position + 1
+        )
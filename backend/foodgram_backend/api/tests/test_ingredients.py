@@ -0,0 +1,41 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes.indexes import ingredient_index
+from recipes.models import Ingredient
+
+
+@override_settings(INGREDIENT_AUTOCOMPLETE_LIMIT=3)
+class IngredientLimitTest(TestCase):
+    """Параметр limit подсказок ингредиентов."""
+    def setUp(self):
+        cache.clear()
+        for number in range(5):
+            Ingredient.objects.create(
+                name=f"сахар {number}", measurement_unit="г"
+            )
+        ingredient_index.invalidate()
+        self.client = APIClient()
+
+    def search(self, flag, limit):
+        return self.client.get(
+            "/api/ingredients/", {flag: 1, "name": "сахар", "limit": limit}
+        )
+
+    def test_limit_is_clamped(self):
+        for flag in ("autocomplete", "fuzzy"):
+            for limit, expected in (("2", 2), ("100", 3), ("0", 1),
+                                    ("-2", 1)):
+                with self.subTest(flag=flag, limit=limit):
+                    response = self.search(flag, limit)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(len(response.json()), expected)
+
+    def test_invalid_limit(self):
+        for flag in ("autocomplete", "fuzzy"):
+            for limit in ("abc", "1.5", ""):
+                with self.subTest(flag=flag, limit=limit):
+                    response = self.search(flag, limit)
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn("limit", response.json())
@@ -0,0 +1,85 @@
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Favorite, Recipe, Tag, TagRecipe
+from users.models import User
+
+URL = "/api/recipes/"
+
+
+class RecipeCursorPaginationTest(TestCase):
+    """Курсорная пагинация ленты рецептов, фильтры и подсчет."""
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="user", email="user@example.com"
+        )
+        self.author = User.objects.create_user(
+            username="author", email="author@example.com"
+        )
+        tag = Tag.objects.create(name="Суп", color="#FF0000", slug="soup")
+        for number in range(12):
+            recipe = Recipe.objects.create(
+                author=self.author if number % 3 else self.user,
+                name=f"Рецепт {number}",
+                text="Борщ со сметаной" if number == 4 else "Каша",
+                cooking_time=5,
+            )
+            if number % 2:
+                TagRecipe.objects.create(recipe=recipe, tag=tag)
+            if number % 4 == 0:
+                Favorite.objects.create(user=self.user, recipe=recipe)
+        # Одинаковая дата у части рецептов: порядок задает id.
+        Recipe.objects.filter(
+            name__in=["Рецепт 3", "Рецепт 4", "Рецепт 5"]
+        ).update(pub_date=datetime(2024, 1, 1, tzinfo=timezone.utc))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def walk(self, params):
+        ids = []
+        data = self.client.get(
+            URL, dict(params, pagination="cursor", limit=5)
+        ).json()
+        while True:
+            self.assertIsNone(data["count"])
+            ids.extend(recipe["id"] for recipe in data["results"])
+            if data["next"] is None:
+                return ids
+            data = self.client.get(data["next"]).json()
+
+    def expected(self, recipes):
+        return list(
+            recipes.order_by("-pub_date", "-id").values_list("pk", flat=True)
+        )
+
+    def test_pages_cover_feed_once(self):
+        self.assertEqual(self.walk({}), self.expected(Recipe.objects.all()))
+
+    def test_filters(self):
+        for params, recipes in (
+            ({"author": self.author.pk},
+             Recipe.objects.filter(author=self.author)),
+            ({"tags": "soup"}, Recipe.objects.filter(tags__slug="soup")),
+            ({"is_favorited": 1},
+             Recipe.objects.filter(favorite_recipe__user=self.user)),
+        ):
+            with self.subTest(params=params):
+                self.assertEqual(self.walk(params), self.expected(recipes))
+
+    def test_count(self):
+        for params, count in (
+            ({}, 12),
+            ({"author": self.author.pk}, 8),
+            ({"search": "борщ"}, 1),
+            ({"search": "zzzz"}, 0),
+        ):
+            with self.subTest(params=params):
+                response = self.client.get(
+                    URL, dict(params, pagination="cursor", count=1)
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()["count"], count)
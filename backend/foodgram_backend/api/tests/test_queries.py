@@ -0,0 +1,154 @@
+from django.core.cache import cache, caches
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes.models import (
+    Favorite,
+    Follow,
+    Ingredient,
+    IngredientRecipe,
+    Recipe,
+    ShoppingCart,
+    Tag,
+    TagRecipe,
+)
+from users.models import User
+
+PAGE_SIZES = (2, 10)
+
+
+class RecipeQueriesMixin:
+    """Рецепты с разным числом тегов и ингредиентов и их читатели."""
+    def setUp(self):
+        cache.clear()
+        caches["recipes"].clear()
+        self.user = User.objects.create_user(
+            username="user", email="user@example.com"
+        )
+        author = User.objects.create_user(
+            username="author", email="author@example.com"
+        )
+        Follow.objects.create(user=self.user, following=author)
+        tags = [
+            Tag.objects.create(
+                name=f"Тег {number}", color=f"#00000{number}",
+                slug=f"tag-{number}",
+            )
+            for number in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f"Ингредиент {number}", measurement_unit="г"
+            )
+            for number in range(4)
+        ]
+        for number in range(12):
+            recipe = Recipe.objects.create(
+                author=author, name=f"Рецепт {number}", cooking_time=5
+            )
+            for tag in tags[:1 + number % 3]:
+                TagRecipe.objects.create(recipe=recipe, tag=tag)
+            for ingredient in ingredients[:1 + number % 4]:
+                IngredientRecipe.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=10
+                )
+            if number % 2:
+                Favorite.objects.create(user=self.user, recipe=recipe)
+                ShoppingCart.objects.create(user=self.user, recipe=recipe)
+        # Рецепты с 1 тегом и ингредиентом и с 3 тегами и 4 ингредиентами.
+        self.light = Recipe.objects.get(name="Рецепт 0")
+        self.heavy = Recipe.objects.get(name="Рецепт 11")
+        self.anonymous = APIClient()
+        self.authenticated = APIClient()
+        self.authenticated.force_authenticate(self.user)
+        # Индексы процесса (слаги тегов) строятся при первом запросе.
+        self.anonymous.get("/api/recipes/")
+
+    def clients(self):
+        return (("anonymous", self.anonymous),
+                ("authenticated", self.authenticated))
+
+    def get(self, client, url, queries):
+        with self.assertNumQueries(queries):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+
+@override_settings(RECIPE_CACHE_ENABLED=False, RECIPE_CARDS_ENABLED=False)
+class RecipeQueriesTest(RecipeQueriesMixin, TestCase):
+    """Число запросов к базе не зависит от размера страницы."""
+    def test_list(self):
+        for name, client in self.clients():
+            for page_size in PAGE_SIZES:
+                with self.subTest(client=name, page_size=page_size):
+                    data = self.get(
+                        client,
+                        "/api/recipes/?pagination=cursor"
+                        f"&limit={page_size}",
+                        3,
+                    )
+                    self.assertEqual(len(data["results"]), page_size)
+            with self.subTest(client=name, page_size="default"):
+                # Страничная пагинация добавляет подсчет рецептов.
+                self.get(client, "/api/recipes/", 4)
+
+    def test_list_flags(self):
+        data = self.get(
+            self.authenticated, "/api/recipes/?pagination=cursor&limit=2", 3
+        )
+        self.assertEqual(
+            [recipe["is_favorited"] for recipe in data["results"]],
+            [True, False],
+        )
+        self.assertTrue(data["results"][0]["author"]["is_subscribed"])
+
+    def test_detail(self):
+        for name, client in self.clients():
+            for recipe in (self.light, self.heavy):
+                with self.subTest(client=name, recipe=recipe.name):
+                    data = self.get(client, f"/api/recipes/{recipe.pk}/", 3)
+                    self.assertEqual(
+                        len(data["ingredients"]),
+                        recipe.ingredients.count(),
+                    )
+
+
+@override_settings(RECIPE_CACHE_ENABLED=True, RECIPE_CARDS_ENABLED=False)
+class CachedRecipeQueriesTest(RecipeQueriesMixin, TestCase):
+    """Рецепты из кеша отдаются одним запросом к базе."""
+    def test_list(self):
+        for page_size in PAGE_SIZES:
+            url = f"/api/recipes/?pagination=cursor&limit={page_size}"
+            self.anonymous.get(url)
+            for name, client in self.clients():
+                with self.subTest(client=name, page_size=page_size):
+                    data = self.get(client, url, 1)
+                    self.assertEqual(len(data["results"]), page_size)
+
+    def test_detail(self):
+        for recipe in (self.light, self.heavy):
+            url = f"/api/recipes/{recipe.pk}/"
+            self.anonymous.get(url)
+            for name, client in self.clients():
+                with self.subTest(client=name, recipe=recipe.name):
+                    data = self.get(client, url, 1)
+                    self.assertEqual(
+                        data["is_favorited"],
+                        name == "authenticated" and recipe == self.heavy,
+                    )
+
+    @override_settings(ALLOWED_HOSTS=["testserver", "cdn.example.com"])
+    def test_image_url_follows_request(self):
+        self.light.image = "recipes/light.png"
+        self.light.save(update_fields=["image"])
+        url = f"/api/recipes/{self.light.pk}/"
+        response = self.anonymous.get(url, HTTP_HOST="cdn.example.com")
+        self.assertEqual(
+            response.json()["image"],
+            "http://cdn.example.com/media/recipes/light.png",
+        )
+        data = self.get(self.anonymous, url, 1)
+        self.assertEqual(
+            data["image"], "http://testserver/media/recipes/light.png"
+        )
@@ -0,0 +1,130 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes.models import (
+    Ingredient,
+    IngredientRecipe,
+    Recipe,
+    Tag,
+    TagRecipe,
+)
+from users.models import User
+
+URL = "/api/recipes/"
+
+
+@override_settings(RECIPE_CACHE_ENABLED=False, RECIPE_CARDS_ENABLED=False)
+class RecipeWriteTest(TestCase):
+    """Рецепт и его связи записываются вместе и пакетами."""
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            username="author", email="author@example.com"
+        )
+        self.tags = [
+            Tag.objects.create(
+                name=f"Тег {number}", color=f"#00000{number}",
+                slug=f"tag-{number}",
+            )
+            for number in range(2)
+        ]
+        self.ingredients = [
+            Ingredient.objects.create(
+                name=f"Ингредиент {number}", measurement_unit="г"
+            )
+            for number in range(16)
+        ]
+        self.recipe = self.create_recipe(self.ingredients[:2])
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+        # Индексы процесса (слаги тегов) строятся при первом запросе.
+        self.client.get(URL)
+
+    def create_recipe(self, ingredients):
+        recipe = Recipe.objects.create(
+            author=self.author, name="Борщ", text="Текст", cooking_time=5
+        )
+        TagRecipe.objects.create(recipe=recipe, tag=self.tags[0])
+        for ingredient in ingredients:
+            IngredientRecipe.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=1
+            )
+        return recipe
+
+    def payload(self, ingredients, name="Щи"):
+        return {
+            "name": name,
+            "text": "Текст",
+            "cooking_time": 5,
+            "tags": [tag.pk for tag in self.tags],
+            "ingredients": [
+                {"id": ingredient.pk, "amount": 2}
+                for ingredient in ingredients
+            ],
+        }
+
+    def relations(self):
+        return (
+            list(self.recipe.tag_recipe.values_list("tag_id", flat=True)),
+            list(
+                self.recipe.ingredient_recipe.order_by("ingredient_id")
+                .values_list("ingredient_id", "amount")
+            ),
+        )
+
+    def test_create_rolls_back(self):
+        with mock.patch.object(
+            IngredientRecipe.objects,
+            "bulk_create",
+            side_effect=IntegrityError("ingredient does not exist"),
+        ), self.assertRaises(IntegrityError):
+            self.client.post(
+                URL, self.payload(self.ingredients[:2]), format="json"
+            )
+        self.assertEqual(Recipe.objects.count(), 1)
+        self.assertEqual(TagRecipe.objects.count(), 1)
+
+    def test_update_rolls_back(self):
+        relations = self.relations()
+        # Сбой после записи связей и самого рецепта.
+        with mock.patch(
+            "api.serializers.mark_similar_stale",
+            side_effect=IntegrityError,
+        ), self.assertRaises(IntegrityError):
+            self.client.patch(
+                f"{URL}{self.recipe.pk}/",
+                self.payload(self.ingredients[1:4]),
+                format="json",
+            )
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.name, "Борщ")
+        self.assertEqual(self.relations(), relations)
+
+    def test_create_queries(self):
+        for count in (2, 8):
+            with self.subTest(ingredients=count):
+                payload = self.payload(
+                    self.ingredients[:count], f"Рецепт {count}"
+                )
+                with self.assertNumQueries(13):
+                    response = self.client.post(URL, payload, format="json")
+                self.assertEqual(response.status_code, 201, response.content)
+
+    def test_update_queries(self):
+        for count in (2, 8):
+            with self.subTest(ingredients=count):
+                recipe = self.create_recipe(self.ingredients[:count])
+                # Половина ингредиентов удаляется, половина меняет
+                # количество, и столько же добавляется.
+                payload = self.payload(
+                    self.ingredients[count // 2:count // 2 + count]
+                )
+                with self.assertNumQueries(19):
+                    response = self.client.patch(
+                        f"{URL}{recipe.pk}/", payload, format="json"
+                    )
+                self.assertEqual(response.status_code, 200, response.content)
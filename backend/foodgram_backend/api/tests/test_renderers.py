@@ -0,0 +1,105 @@
+import datetime
+import io
+import uuid
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+
+from api.parsers import ORJSONParser
+from api.renderers import ORJSONRenderer
+from recipes.models import Ingredient, IngredientRecipe, Recipe, Tag
+from users.models import User
+
+SAMPLES = {
+    "decimal": {"amount": Decimal("1.50"), "list": [Decimal("0.1")]},
+    "datetime": {
+        "aware": timezone.now(),
+        "utc": datetime.datetime(
+            2023, 10, 22, 21, 5, tzinfo=datetime.timezone.utc
+        ),
+        "offset": datetime.datetime(
+            2023, 10, 22, 21, 5, 1, 500,
+            tzinfo=datetime.timezone(datetime.timedelta(hours=3)),
+        ),
+        "naive": datetime.datetime(2023, 10, 22, 21, 5, 1, 123456),
+        "date": datetime.date(2023, 10, 22),
+        "time": datetime.time(21, 5, 1, 123),
+        "timedelta": datetime.timedelta(minutes=45),
+    },
+    "lazy": {
+        "name": gettext_lazy("Рецепт"),
+        "list": [gettext_lazy("Тег")],
+    },
+    "return_list": ReturnList(
+        [ReturnDict({"id": 1, "name": "Борщ"}, serializer=None)],
+        serializer=None,
+    ),
+    "unicode": {
+        "text": "Борщ со сметаной \"в кавычках\" \\ 🍲\u2028\u2029",
+        "control": "\x00\x1f\t\n",
+    },
+    "numbers": {
+        "int": 2 ** 53,
+        "negative": -1,
+        "float": [0.1, 1.5, 100.25],
+        "bool": [True, False],
+        "none": None,
+    },
+    "int_keys": {1: "один", 2: "два"},
+    "uuid": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+    "big_int": 2 ** 70,
+    "empty": [[], {}, ""],
+}
+
+
+class ORJSONCompatibilityTest(TestCase):
+    """ORJSONRenderer и ORJSONParser совместимы со стандартными DRF."""
+    def assertCompatible(self, data):
+        content = JSONRenderer().render(data)
+        self.assertEqual(ORJSONRenderer().render(data), content)
+        self.assertEqual(
+            ORJSONParser().parse(io.BytesIO(content)),
+            JSONParser().parse(io.BytesIO(content)),
+        )
+
+    def test_samples(self):
+        for name, data in SAMPLES.items():
+            with self.subTest(sample=name):
+                self.assertCompatible(data)
+
+    def test_recipes(self):
+        author = User.objects.create_user(
+            username="cook", email="cook@example.com",
+            first_name="Повар", last_name="Поваров",
+        )
+        tag = Tag.objects.create(
+            name="Завтрак", color="#E26C2D", slug="breakfast"
+        )
+        for number in range(3):
+            recipe = Recipe.objects.create(
+                author=author,
+                name=f"Рецепт {number}",
+                text="Нарезать, смешать и запечь. " * 20,
+                cooking_time=45,
+                image=f"recipes/{number}.png",
+            )
+            recipe.tags.add(tag)
+            for ingredient_number in range(1, 4):
+                ingredient, _ = Ingredient.objects.get_or_create(
+                    name=f"Ингредиент {ingredient_number}",
+                    measurement_unit="г",
+                )
+                IngredientRecipe.objects.create(
+                    recipe=recipe,
+                    ingredient=ingredient,
+                    amount=ingredient_number * 10,
+                )
+        response = APIClient().get("/api/recipes/")
+        self.assertEqual(response.status_code, 200)
+        self.assertCompatible(response.data)
@@ -0,0 +1,85 @@
+import csv
+import io
+import json
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, IngredientRecipe, Recipe, ShoppingCart
+from users.models import User
+
+URL = "/api/recipes/download_shopping_cart/"
+
+
+class ShoppingListTest(TestCase):
+    """Выгрузка списка покупок в разных форматах."""
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="user", email="user@example.com"
+        )
+        salt = Ingredient.objects.create(name="Соль", measurement_unit="г")
+        milk = Ingredient.objects.create(name="Молоко", measurement_unit="мл")
+        for amounts in ((5, 200), (10, 300)):
+            recipe = Recipe.objects.create(
+                author=self.user, name=f"Рецепт {amounts}", cooking_time=5
+            )
+            for ingredient, amount in zip((salt, milk), amounts):
+                IngredientRecipe.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=amount
+                )
+            ShoppingCart.objects.create(user=self.user, recipe=recipe)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def download(self, file_format):
+        response = self.client.get(URL, {"format": file_format})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            f'filename="shopping_list.{file_format}"',
+            response["Content-Disposition"],
+        )
+        return b"".join(response.streaming_content).decode()
+
+    def test_txt(self):
+        self.assertEqual(
+            self.download("txt"),
+            "Список ингредиентов к покупке:\n"
+            "• Молоко (мл) - 500\n"
+            "• Соль (г) - 15\n",
+        )
+
+    def test_csv(self):
+        self.assertEqual(
+            list(csv.reader(io.StringIO(self.download("csv")))),
+            [
+                ["name", "measurement_unit", "amount"],
+                ["Молоко", "мл", "500"],
+                ["Соль", "г", "15"],
+            ],
+        )
+
+    def test_json(self):
+        self.assertEqual(
+            json.loads(self.download("json")),
+            [
+                {"name": "Молоко", "measurement_unit": "мл", "amount": 500},
+                {"name": "Соль", "measurement_unit": "г", "amount": 15},
+            ],
+        )
+
+    def test_empty_cart(self):
+        ShoppingCart.objects.all().delete()
+        self.assertEqual(self.download("json"), "[]")
+
+    def test_unknown_format(self):
+        response = self.client.get(URL, {"format": "xml"})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertIn("detail", response.json())
+
+    def test_anonymous(self):
+        for file_format in ("txt", "csv", "json"):
+            with self.subTest(format=file_format):
+                response = APIClient().get(URL, {"format": file_format})
+                self.assertEqual(response.status_code, 401)
+                self.assertIn("detail", response.json())
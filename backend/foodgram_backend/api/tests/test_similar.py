@@ -0,0 +1,37 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.tests import SimilarRecipesMixin
+
+
+class SimilarRecipesApiTest(SimilarRecipesMixin, TestCase):
+    """Похожие рецепты отдаются по убыванию сходства."""
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def similar(self, recipe_id, query=""):
+        response = self.client.get(
+            f"/api/recipes/{recipe_id}/similar/{query}"
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        return [recipe["id"] for recipe in response.json()]
+
+    def test_similar(self):
+        first, second, third, fourth = self.recipes
+        self.assertEqual(self.similar(first.pk), [second.pk, third.pk])
+        self.assertEqual(self.similar(fourth.pk), [])
+
+    def test_limit(self):
+        first, second, _, _ = self.recipes
+        self.assertEqual(self.similar(first.pk, "?limit=1"), [second.pk])
+        self.assertEqual(self.similar(first.pk, "?limit=0"), [])
+        self.assertEqual(len(self.similar(first.pk, "?limit=x")), 2)
+
+    def test_unknown_recipe(self):
+        for recipe_id in (0, "abc"):
+            with self.subTest(recipe_id=recipe_id):
+                response = self.client.get(
+                    f"/api/recipes/{recipe_id}/similar/"
+                )
+                self.assertEqual(response.status_code, 404)
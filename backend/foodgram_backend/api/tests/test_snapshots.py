@@ -0,0 +1,125 @@
+import gzip
+import json
+from unittest import skipIf
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from api.snapshots import brotli, ingredient_snapshot, tag_snapshot
+from recipes.models import Ingredient, Tag
+
+TAGS_URL = "/api/tags/"
+INGREDIENTS_URL = "/api/ingredients/"
+
+
+class CatalogSnapshotTest(TestCase):
+    """Полные списки справочников отдаются готовыми сжатыми снимками."""
+    def setUp(self):
+        cache.clear()
+        for snapshot in (tag_snapshot, ingredient_snapshot):
+            snapshot._checked_at = 0.0
+        self.tag = Tag.objects.create(
+            name="Суп", color="#000000", slug="soup"
+        )
+        self.ingredient = Ingredient.objects.create(
+            name="Соль", measurement_unit="г"
+        )
+
+    def get(self, url, encoding=None, **headers):
+        if encoding is not None:
+            headers["HTTP_ACCEPT_ENCODING"] = encoding
+        response = self.client.get(url, **headers)
+        self.assertIn("Accept-Encoding", response["Vary"])
+        return response
+
+    def decode(self, response):
+        body = response.content
+        encoding = response.get("Content-Encoding")
+        if encoding == "gzip":
+            body = gzip.decompress(body)
+        elif encoding == "br":
+            body = brotli.decompress(body)
+        return json.loads(body)
+
+    def names(self, url):
+        return [item["name"] for item in self.decode(self.get(url, "gzip"))]
+
+    def test_identity(self):
+        response = self.get(TAGS_URL)
+        self.assertNotIn("Content-Encoding", response)
+        self.assertEqual(self.decode(response)[0]["slug"], "soup")
+
+    def test_gzip(self):
+        for encoding in ("gzip", "gzip;q=0.5, br;q=0", "deflate, gzip"):
+            with self.subTest(encoding=encoding):
+                response = self.get(TAGS_URL, encoding)
+                self.assertEqual(response["Content-Encoding"], "gzip")
+                self.assertTrue(response["ETag"].endswith('-gzip"'))
+                self.assertEqual(
+                    self.decode(response), self.decode(self.get(TAGS_URL))
+                )
+
+    @skipIf(brotli is None, "Brotli не установлен")
+    def test_brotli(self):
+        for encoding in ("gzip, br", "*"):
+            with self.subTest(encoding=encoding):
+                response = self.get(TAGS_URL, encoding)
+                self.assertEqual(response["Content-Encoding"], "br")
+                self.assertTrue(response["ETag"].endswith('-br"'))
+                self.assertEqual(
+                    self.decode(response), self.decode(self.get(TAGS_URL))
+                )
+
+    def test_etag_per_encoding(self):
+        etags = {
+            encoding: self.get(TAGS_URL, encoding)["ETag"]
+            for encoding in ("identity", "gzip")
+        }
+        self.assertNotEqual(etags["identity"], etags["gzip"])
+        for encoding, etag in etags.items():
+            with self.subTest(encoding=encoding):
+                response = self.get(
+                    TAGS_URL, encoding, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response["ETag"], etag)
+        # ETag другой кодировки не подходит.
+        response = self.get(
+            TAGS_URL, "gzip", HTTP_IF_NONE_MATCH=etags["identity"]
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_last_modified(self):
+        last_modified = self.get(TAGS_URL)["Last-Modified"]
+        response = self.get(TAGS_URL, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_filtered_list_is_not_a_snapshot(self):
+        response = self.client.get(
+            INGREDIENTS_URL, {"name": "Со"}, HTTP_ACCEPT_ENCODING="gzip"
+        )
+        self.assertNotIn("Content-Encoding", response)
+        self.assertEqual(response.json()[0]["name"], "Соль")
+
+    def test_tag_changes(self):
+        etag = self.get(TAGS_URL, "gzip")["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.name = "Супы"
+            self.tag.save()
+        self.assertEqual(self.names(TAGS_URL), ["Супы"])
+        self.assertNotEqual(self.get(TAGS_URL, "gzip")["ETag"], etag)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.delete()
+        self.assertEqual(self.names(TAGS_URL), [])
+
+    def test_ingredient_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ingredient.name = "Сахар"
+            self.ingredient.save()
+            Ingredient.objects.create(name="Перец", measurement_unit="г")
+        self.assertEqual(
+            sorted(self.names(INGREDIENTS_URL)), ["Перец", "Сахар"]
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ingredient.delete()
+        self.assertEqual(self.names(INGREDIENTS_URL), ["Перец"])
@@ -0,0 +1,68 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from api.tests.test_queries import RecipeQueriesMixin
+
+LIST_URL = "/api/recipes/?pagination=cursor&limit=10"
+
+
+@override_settings(RECIPE_CACHE_ENABLED=False, RECIPE_CARDS_ENABLED=False)
+class SparseFieldsTest(RecipeQueriesMixin, TestCase):
+    """Ответ и запросы к базе ограничены полями ?fields= и ?expand=."""
+    def test_fields(self):
+        data = self.get(
+            self.authenticated, f"{LIST_URL}&fields=id,name,author.username", 1
+        )
+        for recipe in data["results"]:
+            self.assertEqual(set(recipe), {"id", "name", "author"})
+            self.assertEqual(set(recipe["author"]), {"username"})
+
+    def test_expand(self):
+        data = self.get(
+            self.authenticated, f"{LIST_URL}&fields=id&expand=author", 1
+        )
+        self.assertEqual(set(data["results"][0]), {"id", "author"})
+        self.assertEqual(
+            set(data["results"][0]["author"]),
+            {
+                "email", "id", "username", "first_name", "last_name",
+                "is_subscribed",
+            },
+        )
+        self.assertTrue(data["results"][0]["author"]["is_subscribed"])
+
+    def test_nested_list(self):
+        data = self.get(
+            self.anonymous,
+            f"/api/recipes/{self.heavy.pk}/?fields=name,ingredients.amount",
+            2,
+        )
+        self.assertEqual(
+            data,
+            {"name": self.heavy.name, "ingredients": [{"amount": 10}] * 4},
+        )
+
+    def test_only_requested_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.get(self.anonymous, f"{LIST_URL}&fields=id,tags.slug", 2)
+        self.assertNotIn('"recipes_recipe"."text"', queries[0]["sql"])
+        self.assertIn("recipes_tag", queries[1]["sql"])
+
+    def test_user_fields(self):
+        data = self.get(self.authenticated, "/api/users/me/?fields=email", 1)
+        self.assertEqual(data, {"email": self.user.email})
+
+    def test_unknown_fields(self):
+        for url in (
+            f"{LIST_URL}&fields=foo",
+            f"{LIST_URL}&fields=id,author.foo",
+            f"{LIST_URL}&fields=name.foo",
+            f"{LIST_URL}&fields=id&expand=foo",
+            f"/api/recipes/{self.light.pk}/?fields=foo",
+            "/api/users/?fields=foo",
+        ):
+            with self.subTest(url=url):
+                response = self.authenticated.get(url)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("fields", response.json())
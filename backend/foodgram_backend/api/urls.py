@@ -10,6 +10,7 @@ from api.views import (
     FollowViewSet,
     RecipeViewSet,
     TagViewSet,
+    metrics_view,
 )
 
 router = DefaultRouter()
@@ -40,6 +41,7 @@ router.register("recipes", RecipeViewSet)
 router.register("ingredients", IngredientViewSet)
 
 urlpatterns = [
+    path("metrics/", metrics_view, name="metrics"),
     path("auth/", include("djoser.urls.authtoken")),
     path("", include(router_sub_fav_cart.urls)),
     path("", include(router.urls)),
@@ -0,0 +1,67 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+TRUE_VALUES = ("1", "true", "True")
+FIELDS_PARAM = "fields"
+EXPAND_PARAM = "expand"
+
+
+def is_flag_set(request, name):
+    """Проверяет, что параметр запроса name включен."""
+    return request.query_params.get(name) in TRUE_VALUES
+
+
+def parse_sparse_fields(*values):
+    """Дерево полей из списков вида "id,name,author.username".
+
+    Ключи дерева - имена полей, значение None означает поле целиком,
+    словарь - только перечисленные вложенные поля.
+    """
+    tree = {}
+    for value in values:
+        for path in value.split(","):
+            names = [name.strip() for name in path.split(".")]
+            if not all(names):
+                continue
+            node = tree
+            for name in names[:-1]:
+                if name in node and node[name] is None:
+                    break
+                node = node.setdefault(name, {})
+            else:
+                node[names[-1]] = None
+    return tree
+
+
+def get_sparse_fields(request):
+    """Поля ответа из параметров ?fields= и ?expand=.
+
+    expand добавляет к fields вложенные объекты целиком. Без fields
+    возвращает None - ответ содержит все поля.
+    """
+    fields = request.query_params.get(FIELDS_PARAM)
+    if not fields:
+        return None
+    return parse_sparse_fields(
+        fields, request.query_params.get(EXPAND_PARAM, "")
+    )
+
+
+_recipe_write = ContextVar("recipe_write", default=False)
+
+
+@contextmanager
+def recipe_write():
+    """Отключает обработку изменений связей рецепта внутри блока.
+
+    Используется, когда сам рецепт сохраняется после изменения связей.
+    """
+    token = _recipe_write.set(True)
+    try:
+        yield
+    finally:
+        _recipe_write.reset(token)
+
+
+def in_recipe_write():
+    return _recipe_write.get()
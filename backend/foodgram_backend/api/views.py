@@ -1,15 +1,36 @@
+import hmac
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django_filters import rest_framework as filters
-from django.http import HttpResponse
+from django.db.models import Sum
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from djoser import utils as djoser_utils
+from djoser.conf import settings as djoser_settings
 from djoser.views import UserViewSet
 from djoser.serializers import SetPasswordSerializer
 from rest_framework import permissions
 from rest_framework import status
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 
+from api import cache as recipe_cache
+from api.mixins import (
+    CatalogSnapshotMixin,
+    ConditionalListMixin,
+    ConditionalRetrieveMixin,
+    SparseFieldsViewMixin,
+    make_etag,
+)
+from api.pagination import RecipeCursorPagination
+from api.renderers import (
+    ShoppingListCSVRenderer,
+    ShoppingListJSONRenderer,
+    ShoppingListTextRenderer,
+)
 from api.serializers import (
     TagSerializer,
     RecipeSerializer,
@@ -21,8 +42,13 @@ from api.serializers import (
     UserCreateSerializer,
     FavoriteCreateDeleteSerializer,
     CartAddDeleteSerializer,
+    CookableSerializer,
 )
-from core import filters_custom
+from api.snapshots import ingredient_snapshot, tag_snapshot
+from api.utils import is_flag_set
+from core import filters_custom, metrics
+from core.instrumentation import is_admin_request
+from recipes.indexes import cookable_recipes, ingredient_index
 from recipes.models import (
     Recipe,
     Tag,
@@ -31,16 +57,25 @@ from recipes.models import (
     Favorite,
     ShoppingCart,
     IngredientRecipe,
+    recipe_prefetches,
 )
 from users.permissions import (
+    IsAdmin,
     IsAdminOrReadOnly,
     IsAdminOrOwner,
 )
 
 User = get_user_model()
 
+# Действия RecipeViewSet, которые только отображают рецепты.
+RECIPE_READ_ACTIONS = ("list", "retrieve", "similar", "cookable")
+# Поля RecipeSerializer и соответствующие им связи рецепта.
+RECIPE_RELATIONS = {"tags": "tag_recipe", "ingredients": "ingredient_recipe"}
+
+
+class CustomUserViewSet(SparseFieldsViewMixin, UserViewSet):
+    sparse_actions = ("list", "retrieve", "me")
 
-class CustomUserViewSet(UserViewSet):
     @action(["post"], detail=False)
     def set_password(self, request, *args, **kwargs):
         request.data["username"] = request.user.username
@@ -51,15 +86,24 @@ class CustomUserViewSet(UserViewSet):
 
         self.request.user.set_password(serializer.data["new_password"])
         self.request.user.save()
+        if djoser_settings.LOGOUT_ON_PASSWORD_CHANGE:
+            djoser_utils.logout_user(self.request)
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(["get"], detail=False)
     def me(self, request):
-        user = get_object_or_404(User, id=request.user.id)
-        serializer = UserSerializer(user)
+        user = get_object_or_404(self.get_queryset(), id=request.user.id)
+        serializer = UserSerializer(user, fields=self.get_sparse_fields())
         return Response(serializer.data)
 
+    def get_queryset(self):
+        users = super().get_queryset()
+        fields = self.get_sparse_fields()
+        if fields is None:
+            return users
+        return users.only("id", *self.get_sparse_columns(User, fields))
+
     def get_serializer_class(self):
         if self.action == "create":
             return UserCreateSerializer
@@ -73,35 +117,142 @@ class CustomUserViewSet(UserViewSet):
         return super().get_permissions()
 
 
-class IngredientViewSet(ModelViewSet):
+class IngredientViewSet(
+    CatalogSnapshotMixin,
+    ConditionalListMixin,
+    ConditionalRetrieveMixin,
+    ModelViewSet,
+):
     queryset = Ingredient.objects.all()
+    snapshot = ingredient_snapshot
     serializer_class = IngredientSerializer
     permission_classes = (IsAdminOrReadOnly,)
     pagination_class = None
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_class = filters_custom.FilterIngredient
 
-
-class TagViewSet(ModelViewSet):
+    def list(self, request, *args, **kwargs):
+        for flag, search in (
+            ("autocomplete", ingredient_index.autocomplete),
+            ("fuzzy", ingredient_index.fuzzy),
+        ):
+            if is_flag_set(request, flag):
+                return Response(search(
+                    request.query_params.get("name", ""),
+                    self.get_limit(),
+                ))
+        return super().list(request, *args, **kwargs)
+
+    def get_limit(self):
+        """Число подсказок из параметра limit или None."""
+        limit = self.request.query_params.get("limit")
+        if limit is None:
+            return None
+        try:
+            return int(limit)
+        except ValueError:
+            raise ValidationError({"limit": "Ожидается целое число."})
+
+
+class TagViewSet(
+    CatalogSnapshotMixin,
+    ConditionalListMixin,
+    ConditionalRetrieveMixin,
+    ModelViewSet,
+):
     queryset = Tag.objects.all()
+    snapshot = tag_snapshot
     serializer_class = TagSerializer
     permission_classes = (IsAdminOrReadOnly,)
     pagination_class = None
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(
+    SparseFieldsViewMixin, ConditionalRetrieveMixin, ModelViewSet
+):
     queryset = Recipe.objects.all()
+    sparse_actions = RECIPE_READ_ACTIONS
     serializer_class = RecipeSerializer
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_class = filters_custom.FilterRecipe
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
 
+    @property
+    def paginator(self):
+        if (
+            not hasattr(self, "_paginator")
+            and self.action == "list"
+            and RecipeCursorPagination.is_requested(self.request)
+        ):
+            self._paginator = RecipeCursorPagination()
+        return super().paginator
+
     def get_queryset(self):
-        recipes = Recipe.objects.prefetch_related(
-            "ingredient_recipe__ingredient", "tags"
-        ).all()
+        recipes = Recipe.objects.with_user_flags(self.request.user)
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            return self.get_sparse_queryset(recipes, fields)
+        if (
+            settings.RECIPE_CARDS_ENABLED
+            and self.action in RECIPE_READ_ACTIONS
+        ):
+            # Пользователь-независимая часть ответа берется из карточки.
+            return recipes.only(
+                "id", "author", "pub_date", "updated_at", "card"
+            )
+        recipes = recipes.select_related("author").defer("search_vector")
+        if not recipe_cache.is_enabled():
+            # При включенном кеше связанные объекты догружаются
+            # сериализатором только для отсутствующих в кеше рецептов.
+            recipes = recipes.with_related()
         return recipes
 
+    def get_sparse_queryset(self, recipes, fields):
+        """Загружает только столбцы и связи, нужные для полей fields."""
+        # pub_date нужен курсорной пагинации, updated_at - для ETag.
+        columns = [
+            "id",
+            "pub_date",
+            "updated_at",
+            *self.get_sparse_columns(Recipe, fields),
+        ]
+        if "author" in fields:
+            recipes = recipes.select_related("author")
+            if fields["author"] is not None:
+                columns += [
+                    f"author__{name}"
+                    for name in self.get_sparse_columns(
+                        User, {"id": None, **fields["author"]}
+                    )
+                ]
+        relations = {
+            RECIPE_RELATIONS[name]
+            for name in fields
+            if name in RECIPE_RELATIONS
+        }
+        return recipes.only(*columns).prefetch_related(*(
+            prefetch
+            for prefetch in recipe_prefetches()
+            if prefetch.prefetch_to in relations
+        ))
+
+    def get_etag_variant(self):
+        return (*super().get_etag_variant(), self.get_sparse_fields())
+
+    def get_object_validators(self, instance):
+        etag = make_etag(
+            instance.pk,
+            instance.updated_at.timestamp(),
+            instance.is_favorited,
+            instance.is_in_shopping_cart,
+            instance.author_is_subscribed,
+            *self.get_etag_variant(),
+        )
+        if self.request.user.is_authenticated:
+            # Флаги пользователя меняются без изменения рецепта.
+            return etag, None
+        return etag, int(instance.updated_at.timestamp())
+
     def get_serializer_class(self):
         if self.action == "create" or self.action == "update":
             return RecipeCreateUpdateSerializer
@@ -118,44 +269,89 @@ class RecipeViewSet(ModelViewSet):
 
         return Response(serializer.data)
 
-    @action(["get"], detail=False)
+    @action(["get"], detail=True)
+    def similar(self, request, pk=None):
+        """Похожие рецепты из таблицы SimilarRecipe по убыванию сходства."""
+        if not (pk.isdigit() and Recipe.objects.filter(pk=pk).exists()):
+            raise Http404
+        limit = settings.SIMILAR_RECIPES_LIMIT
+        try:
+            limit = min(int(request.query_params.get("limit", limit)), limit)
+        except ValueError:
+            pass
+        recipes = (
+            self.get_queryset()
+            .filter(similar_for__recipe_id=pk)
+            .order_by("-similar_for__score", "-id")[:max(limit, 0)]
+        )
+        return Response(self.get_serializer(recipes, many=True).data)
+
+    @action(
+        ["post"], detail=False, permission_classes=(permissions.AllowAny,)
+    )
+    def cookable(self, request):
+        """Рецепты из имеющихся ингредиентов: сначала те, где меньше
+        всего недостает."""
+        serializer = CookableSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        rows = self.paginate_queryset(cookable_recipes(
+            serializer.validated_data["ingredients"],
+            serializer.validated_data.get("max_missing"),
+        ))
+        recipes = self.get_queryset().in_bulk([row[0] for row in rows])
+        rows = [row for row in rows if row[0] in recipes]
+        data = self.get_serializer(
+            [recipes[recipe_id] for recipe_id, _, _ in rows], many=True
+        ).data
+        for item, (_, missing, matched) in zip(data, rows):
+            item["missing_ingredients"] = missing
+            item["matched_ingredients"] = matched
+        return self.get_paginated_response(data)
+
+    @action(["get"], detail=False, permission_classes=(IsAdmin,))
+    def cache_stats(self, request):
+        return Response(recipe_cache.get_stats())
+
+    @action(
+        ["get"],
+        detail=False,
+        renderer_classes=(
+            ShoppingListTextRenderer,
+            ShoppingListCSVRenderer,
+            ShoppingListJSONRenderer,
+        ),
+    )
     def download_shopping_cart(self, request, *args, **kwargs):
-        ingredients_with_amount = list(
-            IngredientRecipe.objects.filter(
-                recipe__cart_recipe__user=self.request.user
-            ).values(
-                "ingredient__name",
-                "ingredient__measurement_unit",
-                "amount"
-            )
+        ingredients = IngredientRecipe.objects.filter(
+            recipe__cart_recipe__user=self.request.user
+        ).values_list(
+            "ingredient__name", "ingredient__measurement_unit"
+        ).annotate(
+            total=Sum("amount")
+        ).order_by("ingredient__name")
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            metrics.measure_size(
+                (
+                    chunk.encode(renderer.charset)
+                    for chunk in renderer.stream(ingredients.iterator())
+                ),
+                renderer.format,
+            ),
+            content_type=f"{renderer.media_type}; charset={renderer.charset}",
         )
-        ingredients = {}
-        for ingredient in ingredients_with_amount:
-            ingr = ingredient["ingredient__name"]
-            if ingr not in ingredients.keys():
-                ingredients[ingr] = [
-                    ingredient["ingredient__measurement_unit"],
-                    ingredient["amount"],
-                ]
-            else:
-                ingredients[ingr][1] += ingredient["amount"]
-
-        shopping_list_file: str = "Список ингредиентов к покупке:" + "\n"
-        for ingredient in ingredients:
-            shopping_list_file += (
-                f"• {ingredient} "
-                f"({ingredients[ingredient][0]}) - "
-                f"{ingredients[ingredient][1]}"
-            ) + "\n"
-        return HttpResponse(shopping_list_file, content_type="text/plain")
+        response["Content-Disposition"] = (
+            f'attachment; filename="shopping_list.{renderer.format}"'
+        )
+        return response
 
     def get_permissions(self):
         if self.action == "get":
             self.permission_classes = (permissions.AllowAny,)
-        elif self.action == "update" or (
-            self.action == "download_shopping_cart"
-        ):
+        elif self.action == "update":
             self.permission_classes = (IsAdminOrOwner,)
+        elif self.action == "download_shopping_cart":
+            self.permission_classes = (permissions.IsAuthenticated,)
         return super().get_permissions()
 
 
@@ -168,7 +364,9 @@ class FollowViewSet(ModelViewSet):
     )
 
     def get_queryset(self):
-        return Follow.objects.filter(user=self.request.user)
+        return Follow.objects.filter(
+            user=self.request.user
+        ).select_related("following")
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -198,7 +396,9 @@ class FollowListViewSet(ModelViewSet):
     )
 
     def get_queryset(self):
-        return Follow.objects.filter(user=self.request.user)
+        return Follow.objects.filter(
+            user=self.request.user
+        ).select_related("following").order_by("-pub_date", "-id")
 
 
 class FavoriteViewSet(ModelViewSet):
@@ -247,3 +447,22 @@ class CartViewSet(ModelViewSet):
         )
         self.perform_destroy(instance)
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def can_view_metrics(request):
+    """Доступ к метрикам: по токену, адресу или администратору."""
+    token = settings.METRICS_TOKEN
+    header = request.META.get("HTTP_AUTHORIZATION", "")
+    if token and hmac.compare_digest(header, f"Bearer {token}"):
+        return True
+    if request.META.get("REMOTE_ADDR") in settings.METRICS_ALLOWED_IPS:
+        return True
+    return is_admin_request(request)
+
+
+def metrics_view(request):
+    """Метрики приложения в текстовом формате Prometheus."""
+    if not (settings.METRICS_ENABLED and can_view_metrics(request)):
+        raise Http404
+    content, content_type = metrics.render_latest()
+    return HttpResponse(content, content_type=content_type)
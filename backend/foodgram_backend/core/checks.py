@@ -0,0 +1,29 @@
+"""Проверки настроек при запуске (manage.py check)."""
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+PROCESS_LOCAL_CACHES = ("django.core.cache.backends.locmem.LocMemCache",)
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """Кеш по умолчанию должен быть общим для всех процессов.
+
+    В нем хранятся версии рецептов и индексов: с кешем в памяти
+    процесса изменение в одном воркере не видно остальным.
+    """
+    if settings.DEBUG or getattr(settings, "TESTING", False):
+        return []
+    if settings.CACHES["default"]["BACKEND"] not in PROCESS_LOCAL_CACHES:
+        return []
+    return [
+        Error(
+            "Кеш по умолчанию хранится в памяти процесса.",
+            hint=(
+                "Задайте общий кеш в CACHE_BACKEND и CACHE_LOCATION, "
+                "например django.core.cache.backends.memcached."
+                "PyMemcacheCache и memcached:11211."
+            ),
+            id="core.E001",
+        )
+    ]
@@ -0,0 +1,115 @@
+"""Чтение из реплик базы данных для безопасных запросов к API."""
+import hashlib
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = "primary_db_pin"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+# Токены и сессии только что вошедших пользователей читаются из основной
+# базы, иначе запрос сразу после входа мог бы не найти их в реплике.
+PRIMARY_APPS = {"authtoken", "sessions"}
+
+current_replica = ContextVar("current_replica", default=None)
+
+
+class ReplicaRouter:
+    """Направляет чтение в реплику, выбранную для текущего запроса.
+
+    Запись, чтение внутри транзакции и чтение вне запроса к API
+    выполняются в основной базе.
+    """
+    def db_for_read(self, model, **hints):
+        replica = current_replica.get()
+        if (
+            replica is None
+            or model._meta.app_label in PRIMARY_APPS
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+@contextmanager
+def use_primary():
+    """Чтение из основной базы внутри блока.
+
+    Нужно для данных, которые сохраняются под новой версией после
+    записи (индексы, снимки, кеш): реплика может еще не содержать ее.
+    """
+    token = current_replica.set(None)
+    try:
+        yield
+    finally:
+        current_replica.reset(token)
+
+
+def pin_key(request):
+    authorization = request.META.get("HTTP_AUTHORIZATION")
+    if not authorization:
+        return None
+    digest = hashlib.md5(authorization.encode()).hexdigest()
+    return f"primary-db-pin:{digest}"
+
+
+class ReplicaRoutingMiddleware:
+    """Выбирает реплику для безопасных запросов к представлениям api.
+
+    После небезопасного запроса клиент закрепляется за основной базой
+    на REPLICA_PIN_SECONDS секунд, чтобы видеть свои изменения: по
+    cookie и, для клиентов с токеном, по записи в общем кеше.
+    """
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+        finally:
+            current_replica.set(None)
+        if request.method not in SAFE_METHODS:
+            self.pin(request, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, "cls", None)
+        if (
+            request.method in SAFE_METHODS
+            and view_class is not None
+            and view_class.__module__.startswith("api.")
+            and not self.is_pinned(request)
+        ):
+            current_replica.set(random.choice(settings.DATABASE_REPLICAS))
+
+    @staticmethod
+    def is_pinned(request):
+        if PIN_COOKIE in request.COOKIES:
+            return True
+        key = pin_key(request)
+        return key is not None and cache.get(key) is not None
+
+    @staticmethod
+    def pin(request, response):
+        response.set_cookie(
+            PIN_COOKIE,
+            "1",
+            max_age=settings.REPLICA_PIN_SECONDS,
+            httponly=True,
+            samesite="Lax",
+        )
+        key = pin_key(request)
+        if key is not None:
+            cache.set(key, 1, settings.REPLICA_PIN_SECONDS)
@@ -1,6 +1,9 @@
+from django.db.models import Exists, OuterRef
 from django_filters.rest_framework import FilterSet, filters
 
-from recipes.models import Recipe, Ingredient
+from recipes.indexes import tag_slug_index
+from recipes.models import Recipe, Ingredient, TagRecipe
+from recipes.search import search_recipes
 
 
 class FilterIngredient(FilterSet):
@@ -16,6 +19,18 @@ class FilterIngredient(FilterSet):
         fields = ("name",)
 
 
+def tag_choices():
+    return [(slug, slug) for slug in sorted(tag_slug_index.get())]
+
+
+TAGS_MODE_ANY = "any"
+TAGS_MODE_ALL = "all"
+TAGS_MODES = (
+    (TAGS_MODE_ANY, "Любой из тегов"),
+    (TAGS_MODE_ALL, "Все теги"),
+)
+
+
 class FilterRecipe(FilterSet):
     """Фильтр для рецептов."""
 
@@ -27,12 +42,20 @@ class FilterRecipe(FilterSet):
         field_name="is_in_shopping_cart",
         method="filter_is_in_shopping_cart",
     )
-    tags = filters.AllValuesMultipleFilter(
-        field_name="tags__slug",
+    tags = filters.MultipleChoiceFilter(
+        choices=tag_choices,
+        method="filter_tags",
+    )
+    tags_mode = filters.ChoiceFilter(
+        choices=TAGS_MODES,
+        method="filter_tags_mode",
     )
     author = filters.NumberFilter(
         field_name="author_id",
     )
+    search = filters.CharFilter(
+        method="filter_search",
+    )
 
     class Meta:
         model = Recipe
@@ -41,14 +64,45 @@ class FilterRecipe(FilterSet):
             "is_favorited",
             "is_in_shopping_cart",
             "tags",
+            "tags_mode",
+            "search",
         )
 
     def filter_is_favorited(self, queryset, field_name, value):
         if value:
-            return queryset.filter(favorite_recipe__user=self.request.user)
+            return queryset.filter(is_favorited=True)
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, field_name, value):
         if value:
-            return queryset.filter(cart_recipe__user=self.request.user)
+            return queryset.filter(is_in_shopping_cart=True)
+        return queryset
+
+    def filter_search(self, queryset, field_name, value):
+        return search_recipes(queryset, value)
+
+    def filter_tags(self, queryset, field_name, value):
+        slugs = tag_slug_index.get()
+        tag_ids = [slugs[slug] for slug in value if slug in slugs]
+        if self.form.cleaned_data.get("tags_mode") == TAGS_MODE_ALL:
+            if len(tag_ids) < len(set(value)):
+                return queryset.none()
+            for tag_id in tag_ids:
+                queryset = queryset.filter(
+                    Exists(
+                        TagRecipe.objects.filter(
+                            recipe=OuterRef("pk"), tag_id=tag_id
+                        )
+                    )
+                )
+            return queryset
+        return queryset.filter(
+            Exists(
+                TagRecipe.objects.filter(
+                    recipe=OuterRef("pk"), tag_id__in=tag_ids
+                )
+            )
+        )
+
+    def filter_tags_mode(self, queryset, field_name, value):
         return queryset
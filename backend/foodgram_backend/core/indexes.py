@@ -0,0 +1,197 @@
+import threading
+import time
+from functools import partial
+
+from django.core.cache import cache
+from django.db import connections, transaction
+
+from core.db_router import use_primary
+
+
+class VersionedIndex:
+    """Индекс в памяти процесса.
+
+    Номер версии индекса хранится в общем кеше: после invalidate()
+    каждый процесс перестраивает свою копию при следующем обращении,
+    проверяя версию не чаще раза в check_interval секунд.
+    """
+    version_key = None
+    check_interval = 1.0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = None
+        self._version = None
+        self._checked_at = 0.0
+
+    def build(self):
+        raise NotImplementedError
+
+    def refresh(self):
+        """Догоняет изменения без перестроения.
+
+        Возвращает False, если индекс нужно перестроить целиком.
+        """
+        return True
+
+    def current_version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, time.time_ns(), timeout=None)
+            version = cache.get(self.version_key)
+        return version
+
+    def get(self, block=True):
+        """Данные индекса, при необходимости перестроенные.
+
+        При block=False устаревший индекс перестраивается в фоновом
+        потоке, а до окончания построения возвращается None.
+        """
+        now = time.monotonic()
+        if (
+            self._data is not None
+            and now - self._checked_at < self.check_interval
+        ):
+            return self._data
+        version = self.current_version()
+        if not block:
+            if (
+                self._data is not None
+                and version == self._version
+                and self.refresh_unless_building()
+            ):
+                self._checked_at = now
+                return self._data
+            self.build_in_background()
+            return None
+        with self._lock:
+            if (
+                self._data is None
+                or version != self._version
+                or not self.refresh()
+            ):
+                self.rebuild(version)
+            self._checked_at = now
+            return self._data
+
+    def refresh_unless_building(self):
+        if not self._lock.acquire(blocking=False):
+            # Пока индекс строится, используется прежняя копия.
+            return True
+        try:
+            return self.refresh()
+        finally:
+            self._lock.release()
+
+    def rebuild(self, version):
+        with use_primary():
+            self._data = self.build()
+        self._version = version
+
+    def build_in_background(self):
+        if not self._lock.acquire(blocking=False):
+            # Индекс уже строится.
+            return
+
+        def run():
+            try:
+                self.rebuild(self.current_version())
+                self._checked_at = time.monotonic()
+            finally:
+                self._lock.release()
+                connections.close_all()
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def invalidate(self):
+        """Помечает индекс устаревшим во всех процессах после коммита."""
+        transaction.on_commit(
+            lambda: cache.set(self.version_key, time.time_ns(), timeout=None)
+        )
+        self._checked_at = 0.0
+
+
+class IncrementalIndex(VersionedIndex):
+    """Индекс, который обновляется по ключам изменившихся объектов.
+
+    После коммита changed() дописывает ключи в журнал в общем кеше,
+    а каждый процесс при проверке версии применяет к своей копии новые
+    записи журнала методом update(). Если записей больше max_changes
+    или часть из них вытеснена из кеша, индекс перестраивается целиком.
+    Ключи, измененные в одной транзакции, попадают в одну запись.
+    """
+    max_changes = 100
+    changes_timeout = 60 * 60
+
+    def __init__(self):
+        super().__init__()
+        self._position = 0
+        self._pending = threading.local()
+
+    @property
+    def position_key(self):
+        return f"{self.version_key}:position"
+
+    def change_key(self, position):
+        return f"{self.version_key}:change:{position}"
+
+    def update(self, data, keys):
+        """Новые данные индекса с учетом изменений объектов keys."""
+        raise NotImplementedError
+
+    def current_position(self):
+        return cache.get(self.position_key, 0)
+
+    def rebuild(self, version):
+        # Изменения, записанные во время построения, применятся еще раз,
+        # поэтому update() должен быть идемпотентным.
+        position = self.current_position()
+        super().rebuild(version)
+        self._position = position
+
+    def refresh(self):
+        position = self.current_position()
+        pending = position - self._position
+        if pending == 0:
+            return True
+        if not 0 < pending <= self.max_changes:
+            return False
+        changes = cache.get_many([
+            self.change_key(number)
+            for number in range(self._position + 1, position + 1)
+        ])
+        if len(changes) < pending:
+            return False
+        keys = set().union(*changes.values())
+        with use_primary():
+            self._data = self.update(self._data, keys)
+        self._position = position
+        return True
+
+    def changed(self, keys):
+        """Записывает изменившиеся ключи в журнал после коммита."""
+        keys = set(keys)
+        if not keys:
+            return
+        connection = transaction.get_connection()
+        batch = getattr(self._pending, "batch", None)
+        if batch is None or not any(
+            # Записи транзакции еще не отправлены и не отменены откатом.
+            isinstance(callback, partial) and callback.args[0] is batch
+            for _, callback in connection.run_on_commit
+        ):
+            batch = self._pending.batch = set()
+        batch.update(keys)
+        transaction.on_commit(partial(self.log_batch, batch))
+
+    def log_batch(self, batch):
+        # Журнал пополняет первый из вызовов после коммита.
+        if batch:
+            self.log_changes(list(batch))
+            batch.clear()
+
+    def log_changes(self, keys):
+        cache.add(self.position_key, 0, timeout=None)
+        position = cache.incr(self.position_key)
+        cache.set(self.change_key(position), keys, self.changes_timeout)
+        self._checked_at = 0.0
@@ -0,0 +1,190 @@
+"""Замер запросов к базе и времени сериализации в рамках HTTP-запроса."""
+import json
+import logging
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework import exceptions, serializers
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from core import metrics as prometheus
+from core.streams import WrappedStream
+
+logger = logging.getLogger("foodgram.requests")
+
+current_metrics = ContextVar("current_metrics", default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    """Представление выполнило больше запросов, чем разрешено."""
+
+
+class RequestMetrics:
+    """Метрики одного HTTP-запроса."""
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+
+class TimedSerializerMixin:
+    """Учитывает время получения serializer.data в метриках запроса."""
+    @property
+    def data(self):
+        metrics = current_metrics.get()
+        if metrics is None or metrics.serializing:
+            return super().data
+        metrics.serializing = True
+        started = time.perf_counter()
+        try:
+            return super().data
+        finally:
+            metrics.serializer_time += time.perf_counter() - started
+            metrics.serializing = False
+
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    """Список объектов с замером времени сериализации."""
+
+
+def get_view_name(request):
+    """Имя представления вида RecipeViewSet.list."""
+    match = request.resolver_match
+    if match is None:
+        return None
+    view_class = getattr(match.func, "cls", None)
+    if view_class is None:
+        return match.view_name
+    actions = getattr(match.func, "actions", None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return f"{view_class.__name__}.{action}"
+
+
+def is_admin_request(request):
+    """Проверяет пользователя теми же способами, что и API."""
+    authenticators = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    drf_request = Request(
+        request, authenticators=[auth() for auth in authenticators]
+    )
+    try:
+        user = drf_request.user
+    except exceptions.APIException:
+        return False
+    return user.is_authenticated and user.is_admin
+
+
+class QueryInstrumentationMiddleware:
+    """Считает запросы к базе, время базы и сериализации для запроса.
+
+    При REQUEST_INSTRUMENTATION результат отдается в заголовке
+    Server-Timing и пишется в лог foodgram.requests. Если задан бюджет
+    запросов для представления (QUERY_BUDGETS или QUERY_BUDGET_DEFAULT),
+    его превышение пишется в лог как предупреждение или, при
+    QUERY_BUDGET_ACTION = "raise", приводит к исключению
+    QueryBudgetExceeded. У потоковых ответов тело к этому моменту уже
+    отправлено, поэтому превышение только пишется в лог. При
+    METRICS_ENABLED те же значения учитываются в метриках Prometheus.
+
+    Для потоковых ответов учитывается и формирование тела, а итоги
+    подводятся после его отправки, поэтому Server-Timing не передается.
+    """
+    def __init__(self, get_response):
+        self.report = settings.REQUEST_INSTRUMENTATION
+        self.export = settings.METRICS_ENABLED
+        if not (self.report or self.export):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        started = time.perf_counter()
+        response = self.measure(metrics, self.get_response, request)
+        if response.streaming:
+            response.streaming_content = WrappedStream(
+                response.streaming_content,
+                lambda *args: self.measure(metrics, *args),
+                lambda: self.finish(request, response, metrics, started),
+            )
+        else:
+            self.finish(request, response, metrics, started)
+        return response
+
+    @staticmethod
+    def measure(metrics, function, *args):
+        """Вызывает function, учитывая ее запросы к базе в metrics."""
+        token = current_metrics.set(metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                return function(*args)
+        finally:
+            current_metrics.reset(token)
+
+    def finish(self, request, response, metrics, started):
+        total_time = time.perf_counter() - started
+        view_name = get_view_name(request)
+        if self.export:
+            prometheus.observe_request(
+                view_name,
+                request.method,
+                response.status_code,
+                total_time,
+                metrics.queries,
+            )
+        if self.report:
+            self.report_metrics(
+                request, response, view_name, metrics, total_time
+            )
+
+    def report_metrics(
+        self, request, response, view_name, metrics, total_time
+    ):
+        if not response.streaming:
+            response["Server-Timing"] = ", ".join((
+                f'db;dur={metrics.db_time * 1000:.1f};'
+                f'desc="{metrics.queries} queries"',
+                f"serializer;dur={metrics.serializer_time * 1000:.1f}",
+                f"total;dur={total_time * 1000:.1f}",
+            ))
+        logger.info(json.dumps({
+            "method": request.method,
+            "path": request.path,
+            "view": view_name,
+            "status": response.status_code,
+            "queries": metrics.queries,
+            "db_ms": round(metrics.db_time * 1000, 1),
+            "serializer_ms": round(metrics.serializer_time * 1000, 1),
+            "total_ms": round(total_time * 1000, 1),
+        }))
+        self.check_budget(
+            view_name, metrics.queries, can_raise=not response.streaming
+        )
+
+    def check_budget(self, view_name, queries, can_raise=True):
+        budget = settings.QUERY_BUDGETS.get(
+            view_name, settings.QUERY_BUDGET_DEFAULT
+        )
+        if budget is None or queries <= budget:
+            return
+        message = (
+            f"{view_name}: выполнено {queries} запросов к базе "
+            f"при бюджете {budget}"
+        )
+        if can_raise and settings.QUERY_BUDGET_ACTION == "raise":
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
@@ -0,0 +1,122 @@
+import csv
+import random
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from recipes.indexes import IngredientIndex
+from recipes.models import Ingredient
+
+
+class CsvIngredientIndex(IngredientIndex):
+    """Индекс ингредиентов, построенный по строкам CSV-файла."""
+    version_key = "benchmark-ingredient-index-version"
+
+    def __init__(self, rows):
+        super().__init__()
+        self.rows = rows
+
+    def build(self):
+        return self.build_from_rows(self.rows)
+
+
+def misspell(name, rng):
+    """Одна случайная опечатка: пропуск, замена или перестановка букв."""
+    if len(name) < 4:
+        return name
+    position = rng.randrange(1, len(name) - 1)
+    kind = rng.choice(("drop", "replace", "swap"))
+    if kind == "drop":
+        return name[:position] + name[position + 1:]
+    if kind == "replace":
+        return name[:position] + rng.choice("аеиоу") + name[position + 1:]
+    return (
+        name[:position - 1] + name[position] + name[position - 1]
+        + name[position + 1:]
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает фильтр startswith с индексом автодополнения "
+        "и нечетким поиском на data/ingredients.csv."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--queries", type=int, default=500)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def measure(self, title, queries, search, expected=None):
+        found = 0
+        started = time.perf_counter()
+        for number, query in enumerate(queries):
+            names = search(query)
+            if expected is not None and expected[number] in names:
+                found += 1
+        elapsed = (time.perf_counter() - started) / len(queries) * 1000
+        line = f"{title}: {elapsed:.3f} мс/запрос"
+        if expected is not None:
+            line += f", найдено {found * 100 / len(queries):.1f}%"
+        self.stdout.write(line)
+
+    def handle(self, *args, **options):
+        with open(
+            f"{settings.BASE_DIR}/data/ingredients.csv",
+            "r",
+            encoding="utf-8",
+        ) as csv_file:
+            rows = [
+                (number, name, unit)
+                for number, (name, unit) in enumerate(csv.reader(csv_file))
+            ]
+        rng = random.Random(options["seed"])
+        sample = [rng.choice(rows)[1] for _ in range(options["queries"])]
+        prefixes = [name[:3] for name in sample]
+        typos = [misspell(name, rng) for name in sample]
+
+        started = time.perf_counter()
+        index = CsvIngredientIndex(rows)
+        index.get()
+        self.stdout.write(
+            f"Построение индекса ({len(rows)} ингредиентов): "
+            f"{(time.perf_counter() - started) * 1000:.1f} мс"
+        )
+
+        if Ingredient.objects.exists():
+            def startswith(query):
+                return list(
+                    Ingredient.objects.filter(
+                        name__startswith=query
+                    ).values_list("name", flat=True)
+                )
+            title = "startswith (БД)"
+        else:
+            def startswith(query):
+                return [name for _, name, _ in rows if name.startswith(query)]
+            title = "startswith (в памяти, таблица ингредиентов пуста)"
+
+        def names(items):
+            return [item["name"] for item in items]
+
+        self.stdout.write("Префиксы:")
+        self.measure(title, prefixes, startswith)
+        self.measure(
+            "autocomplete",
+            prefixes,
+            lambda query: names(index.autocomplete(query)),
+        )
+        self.stdout.write("Опечатки:")
+        self.measure(title, typos, startswith, sample)
+        self.measure(
+            "autocomplete",
+            typos,
+            lambda query: names(index.autocomplete(query)),
+            sample,
+        )
+        self.measure(
+            "fuzzy",
+            typos,
+            lambda query: names(index.fuzzy(query)),
+            sample,
+        )
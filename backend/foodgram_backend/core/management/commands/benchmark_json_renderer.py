@@ -0,0 +1,126 @@
+import io
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+
+from api.parsers import ORJSONParser
+from api.renderers import ORJSONRenderer
+from api.serializers import RecipeSerializer
+from recipes.models import Recipe
+
+
+def synthetic_recipes(count):
+    """Данные в форме ответа RecipeSerializer без обращения к базе."""
+    return ReturnList(
+        [
+            ReturnDict(
+                {
+                    "id": number,
+                    "tags": [
+                        {
+                            "id": 1,
+                            "name": "Завтрак",
+                            "color": "#E26C2D",
+                            "slug": "breakfast",
+                        }
+                    ],
+                    "author": {
+                        "email": "cook@example.com",
+                        "id": 1,
+                        "username": "cook",
+                        "first_name": "Повар",
+                        "last_name": "Поваров",
+                        "is_subscribed": False,
+                    },
+                    "ingredients": [
+                        {
+                            "id": ingredient,
+                            "name": f"Ингредиент {ingredient}",
+                            "measurement_unit": "г",
+                            "amount": ingredient * 10,
+                        }
+                        for ingredient in range(1, 11)
+                    ],
+                    "is_favorited": False,
+                    "is_in_shopping_cart": False,
+                    "name": f"Рецепт {number}",
+                    "image": f"http://localhost/media/recipes/{number}.png",
+                    "text": "Нарезать, смешать и запечь. " * 20,
+                    "cooking_time": 45,
+                },
+                serializer=None,
+            )
+            for number in range(count)
+        ],
+        serializer=None,
+    )
+
+
+def database_recipes(count):
+    request = Request(APIRequestFactory().get("/api/recipes/"))
+    request.user = AnonymousUser()
+    recipes = (
+        Recipe.objects.select_related("author")
+        .defer("search_vector")
+        .with_user_flags(request.user)
+        .with_related()[:count]
+    )
+    return RecipeSerializer(
+        recipes, many=True, context={"request": request}
+    ).data
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает скорость ORJSONRenderer и JSONRenderer на ответе "
+        "RecipeSerializer. Совместимость вывода проверяется тестами "
+        "api.tests.test_renderers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=6)
+        parser.add_argument("--iterations", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if Recipe.objects.exists():
+            payload = database_recipes(options["recipes"])
+        else:
+            payload = synthetic_recipes(options["recipes"])
+        self.benchmark(payload, options["iterations"])
+
+    def measure(self, title, function, iterations):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            function()
+        elapsed = (time.perf_counter() - started) / iterations * 1e6
+        self.stdout.write(f"{title}: {elapsed:.1f} мкс")
+        return elapsed
+
+    def benchmark(self, payload, iterations):
+        content = JSONRenderer().render(payload)
+        self.stdout.write(
+            f"Ответ из {len(payload)} рецептов, {len(content)} байт:"
+        )
+        for action, standard, fast in (
+            (
+                "Рендеринг",
+                lambda: JSONRenderer().render(payload),
+                lambda: ORJSONRenderer().render(payload),
+            ),
+            (
+                "Разбор",
+                lambda: JSONParser().parse(io.BytesIO(content)),
+                lambda: ORJSONParser().parse(io.BytesIO(content)),
+            ),
+        ):
+            standard_time = self.measure(
+                f"{action}, json", standard, iterations
+            )
+            fast_time = self.measure(f"{action}, orjson", fast, iterations)
+            self.stdout.write(f"  ускорение x{standard_time / fast_time:.1f}")
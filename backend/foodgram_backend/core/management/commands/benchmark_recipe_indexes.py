@@ -0,0 +1,215 @@
+import random
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientRecipe,
+    Recipe,
+    ShoppingCart,
+    Tag,
+    TagRecipe,
+)
+
+User = get_user_model()
+
+INDEXED_MODELS = (Recipe, IngredientRecipe, TagRecipe)
+BATCH_SIZE = 5000
+
+
+def bulk_create(model, objects, **lookup):
+    """Создает объекты и перечитывает их вместе с первичными ключами."""
+    model.objects.bulk_create(objects, batch_size=BATCH_SIZE)
+    return list(model.objects.filter(**lookup).order_by("pk"))
+
+
+class Rollback(Exception):
+    """Откатывает сгенерированные данные после замеров."""
+
+
+class Command(BaseCommand):
+    help = (
+        "Показывает планы EXPLAIN основных запросов к рецептам без индексов "
+        "и ограничений связей и с ними на сгенерированных данных. "
+        "Все изменения откатываются."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=50000)
+        parser.add_argument("--users", type=int, default=500)
+        parser.add_argument("--ingredients-per-recipe", type=int, default=8)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--analyze",
+            action="store_true",
+            help="Выполнять запросы (EXPLAIN ANALYZE).",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Замеры рассчитаны на PostgreSQL.")
+        try:
+            with transaction.atomic():
+                self.generate(options)
+                queries = self.get_queries()
+                with connection.schema_editor() as editor:
+                    self.drop_indexes(editor)
+                self.report("Без индексов", queries, options["analyze"])
+                with connection.schema_editor() as editor:
+                    self.create_indexes(editor)
+                self.report("С индексами", queries, options["analyze"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def generate(self, options):
+        rng = random.Random(options["seed"])
+        users = bulk_create(
+            User,
+            (
+                User(
+                    username=f"explain-{number}",
+                    email=f"explain-{number}@example.com",
+                )
+                for number in range(options["users"])
+            ),
+            username__startswith="explain-",
+        )
+        tags = bulk_create(
+            Tag,
+            (
+                Tag(
+                    name=f"explain-{number}",
+                    color=f"#e{number:05x}",
+                    slug=f"explain-{number}",
+                )
+                for number in range(10)
+            ),
+            name__startswith="explain-",
+        )
+        ingredients = list(Ingredient.objects.order_by("pk"))
+        if len(ingredients) < 100:
+            ingredients += bulk_create(
+                Ingredient,
+                (
+                    Ingredient(name=f"explain-{number}", measurement_unit="г")
+                    for number in range(1000)
+                ),
+                name__startswith="explain-",
+            )
+        recipes = bulk_create(
+            Recipe,
+            (
+                Recipe(
+                    author=rng.choice(users),
+                    name=f"explain-{number}",
+                    text="explain",
+                    cooking_time=10,
+                )
+                for number in range(options["recipes"])
+            ),
+            name__startswith="explain-",
+        )
+        IngredientRecipe.objects.bulk_create(
+            (
+                IngredientRecipe(
+                    recipe=recipe, ingredient=ingredient, amount=1
+                )
+                for recipe in recipes
+                for ingredient in rng.sample(
+                    ingredients, options["ingredients_per_recipe"]
+                )
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        TagRecipe.objects.bulk_create(
+            (
+                TagRecipe(recipe=recipe, tag=tag)
+                for recipe in recipes
+                for tag in rng.sample(tags, 2)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        for model, per_user in ((Favorite, 50), (ShoppingCart, 10)):
+            model.objects.bulk_create(
+                (
+                    model(user=user, recipe=recipe)
+                    for user in users
+                    for recipe in rng.sample(recipes, per_user)
+                ),
+                batch_size=BATCH_SIZE,
+            )
+        self.user = users[0]
+        self.tag = tags[0]
+        self.ingredient = ingredients[-1]
+        self.recipe = recipes[len(recipes) // 2]
+        self.stdout.write(
+            f"Сгенерировано: {len(recipes)} рецептов, {len(users)} "
+            f"пользователей, {len(ingredients)} ингредиентов."
+        )
+
+    def get_queries(self):
+        return (
+            (
+                "Лента рецептов",
+                Recipe.objects.order_by("-pub_date", "-id")[:6],
+            ),
+            (
+                "Рецепты автора",
+                Recipe.objects.filter(author=self.user)[:6],
+            ),
+            (
+                "Избранное пользователя",
+                Recipe.objects.filter(favorite_recipe__user=self.user)[:6],
+            ),
+            (
+                "Список покупок",
+                Recipe.objects.filter(cart_recipe__user=self.user)[:6],
+            ),
+            (
+                "Рецепты с тегом",
+                Recipe.objects.filter(tag_recipe__tag=self.tag)[:6],
+            ),
+            (
+                "Рецепты с ингредиентом",
+                IngredientRecipe.objects.filter(
+                    ingredient=self.ingredient
+                ).values("recipe"),
+            ),
+            (
+                "Ингредиент рецепта",
+                IngredientRecipe.objects.filter(
+                    recipe=self.recipe, ingredient=self.ingredient
+                ),
+            ),
+        )
+
+    @staticmethod
+    def drop_indexes(editor):
+        for model in INDEXED_MODELS:
+            for constraint in model._meta.constraints:
+                editor.remove_constraint(model, constraint)
+            for index in model._meta.indexes:
+                editor.remove_index(model, index)
+
+    @staticmethod
+    def create_indexes(editor):
+        for model in INDEXED_MODELS:
+            for constraint in model._meta.constraints:
+                editor.add_constraint(model, constraint)
+            for index in model._meta.indexes:
+                editor.add_index(model, index)
+
+    def report(self, title, queries, analyze):
+        options = {"analyze": True} if analyze else {}
+        with connection.cursor() as cursor:
+            for model in INDEXED_MODELS + (Favorite, ShoppingCart):
+                cursor.execute(f"ANALYZE {model._meta.db_table}")
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{title}:"))
+        for name, queryset in queries:
+            self.stdout.write(self.style.SUCCESS(name))
+            self.stdout.write(queryset.explain(**options))
+            self.stdout.write("")
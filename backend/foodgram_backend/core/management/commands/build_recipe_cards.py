@@ -0,0 +1,28 @@
+from django.core.management import BaseCommand
+
+from api.serializers import RecipeSerializer
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = "Строит устаревшие карточки рецептов (Recipe.card)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Перестроить карточки всех рецептов.",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.all()
+        if not options["all"]:
+            recipes = recipes.filter(card__isnull=True)
+        recipe_ids = list(recipes.order_by("pk").values_list("pk", flat=True))
+        batch_size = options["batch_size"]
+        for start in range(0, len(recipe_ids), batch_size):
+            RecipeSerializer.build_cards(recipe_ids[start:start + batch_size])
+        self.stdout.write(
+            self.style.SUCCESS(f"Построено карточек: {len(recipe_ids)}")
+        )
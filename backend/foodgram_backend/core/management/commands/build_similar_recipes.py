@@ -0,0 +1,32 @@
+import time
+
+from django.core.management import BaseCommand
+
+from recipes.similarity import rebuild, update_stale
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает таблицу похожих рецептов."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--stale",
+            action="store_true",
+            help="Пересчитать только рецепты, измененные после прошлого "
+                 "запуска (для запуска по расписанию).",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options["stale"]:
+            total = update_stale(options["batch_size"])
+            message = f"Пересчитано рецептов: {total}"
+        else:
+            total = rebuild(options["batch_size"])
+            message = f"Сохранено пар похожих рецептов: {total}"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{message} за {time.perf_counter() - started:.1f} с"
+            )
+        )
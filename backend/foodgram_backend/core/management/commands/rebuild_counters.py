@@ -0,0 +1,56 @@
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Follow, Recipe
+
+User = get_user_model()
+
+COUNTERS = (
+    (Recipe, "favorites_count", Favorite, "recipe"),
+    (User, "recipes_count", Recipe, "author"),
+    (User, "followers_count", Follow, "following"),
+)
+
+
+def count_subquery(model, field):
+    return Coalesce(
+        models.Subquery(
+            model.objects.filter(**{field: models.OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=models.Count("pk"))
+            .values("total")
+        ),
+        0,
+    )
+
+
+class Command(BaseCommand):
+    help = "Сверяет и пересчитывает денормализованные счетчики."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Только показать расхождения, ничего не исправляя.",
+        )
+
+    def handle(self, *args, **options):
+        for model, field, related_model, related_field in COUNTERS:
+            actual = count_subquery(related_model, related_field)
+            with transaction.atomic():
+                stale = model.objects.annotate(actual=actual).exclude(
+                    **{field: models.F("actual")}
+                )
+                stale_ids = list(stale.values_list("pk", flat=True))
+                if stale_ids and not options["check"]:
+                    model.objects.filter(pk__in=stale_ids).update(
+                        **{field: actual}
+                    )
+            self.stdout.write(
+                f"{model.__name__}.{field}: расхождений {len(stale_ids)}"
+            )
+        if not options["check"]:
+            self.stdout.write(self.style.SUCCESS("Счетчики пересчитаны"))
@@ -0,0 +1,85 @@
+"""Метрики приложения в формате Prometheus.
+
+При запуске под gunicorn с несколькими воркерами значения пишутся
+в файлы каталога PROMETHEUS_MULTIPROC_DIR (см. gunicorn.conf.py)
+и собираются со всех процессов при выдаче /api/metrics/.
+"""
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+MULTIPROCESS_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+REQUESTS = Counter(
+    "foodgram_requests_total",
+    "Количество HTTP-запросов.",
+    ("view", "method", "status"),
+)
+REQUEST_LATENCY = Histogram(
+    "foodgram_request_duration_seconds",
+    "Время обработки HTTP-запроса.",
+    ("view",),
+)
+REQUEST_QUERIES = Histogram(
+    "foodgram_request_db_queries",
+    "Количество запросов к базе за HTTP-запрос.",
+    ("view",),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+CACHE_REQUESTS = Counter(
+    "foodgram_cache_requests_total",
+    "Обращения к кешам приложения.",
+    ("cache", "result"),
+)
+SHOPPING_LIST_SIZE = Histogram(
+    "foodgram_shopping_list_bytes",
+    "Размер файла списка покупок.",
+    ("format",),
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576),
+)
+
+
+def observe_request(view_name, method, status, duration, queries):
+    view_name = view_name or "unresolved"
+    REQUESTS.labels(view_name, method, status).inc()
+    REQUEST_LATENCY.labels(view_name).observe(duration)
+    REQUEST_QUERIES.labels(view_name).observe(queries)
+
+
+def observe_cache(cache_name, hits, misses):
+    if hits:
+        CACHE_REQUESTS.labels(cache_name, "hit").inc(hits)
+    if misses:
+        CACHE_REQUESTS.labels(cache_name, "miss").inc(misses)
+
+
+def measure_size(chunks, file_format):
+    """Передает части файла дальше и учитывает его итоговый размер.
+
+    Размер учитывается и при закрытии ответа до окончания файла.
+    """
+    size = 0
+    try:
+        for chunk in chunks:
+            size += len(chunk)
+            yield chunk
+    finally:
+        SHOPPING_LIST_SIZE.labels(file_format).observe(size)
+
+
+def render_latest():
+    """Текст метрик и его Content-Type."""
+    if os.environ.get(MULTIPROCESS_ENV):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -12,3 +12,42 @@ class CreatedModel(models.Model):
     class Meta:
         abstract = True
         ordering = ("pub_date",)
+
+
+class UpdatedModel(models.Model):
+    """Абстрактная модель для добавления даты изменения."""
+    updated_at = models.DateTimeField(
+        "Дата изменения",
+        help_text="Дата изменения",
+        auto_now=True,
+    )
+
+    class Meta:
+        abstract = True
+
+
+class CountersMixin:
+    """Модель с денормализованными счетчиками.
+
+    Счетчики из counter_fields изменяются только атомарными запросами
+    с F(), поэтому save() записывает их, лишь если они явно указаны
+    в update_fields: иначе прочитанное раньше значение затерло бы
+    изменения, сделанные после чтения объекта.
+    """
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (
+            not self._state.adding
+            and not kwargs.get("force_insert")
+            and kwargs.get("update_fields") is None
+        ):
+            deferred = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.attname not in deferred
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
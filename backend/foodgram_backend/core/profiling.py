@@ -0,0 +1,93 @@
+"""Профилирование отдельных запросов в рабочем окружении."""
+import cProfile
+import logging
+import os
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from core.instrumentation import get_view_name, is_admin_request
+from core.streams import WrappedStream
+
+logger = logging.getLogger("foodgram.profiling")
+
+PROFILE_HEADER = "HTTP_X_PROFILE"
+
+
+def profile(profiler, function, *args):
+    """Вызывает function под профилировщиком."""
+    profiler.enable()
+    try:
+        return function(*args)
+    finally:
+        profiler.disable()
+
+
+class ProfilingMiddleware:
+    """Профилирует запрос с помощью cProfile и сохраняет .prof-файл.
+
+    Запрос профилируется, если администратор передал заголовок
+    X-Profile: 1 или если он попал в выборку PROFILING_SAMPLE_RATE.
+    Для потоковых ответов учитывается и формирование тела ответа.
+    Одновременно профилируется не больше PROFILING_MAX_CONCURRENT
+    запросов, остальные выполняются как обычно.
+    """
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slots = threading.BoundedSemaphore(
+            settings.PROFILING_MAX_CONCURRENT
+        )
+        os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+        if not self.slots.acquire(blocking=False):
+            logger.info("Превышен лимит одновременных профилей")
+            return self.get_response(request)
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        except Exception:
+            self.slots.release()
+            raise
+        finally:
+            profiler.disable()
+        if response.streaming:
+            response.streaming_content = WrappedStream(
+                response.streaming_content,
+                lambda *args: profile(profiler, *args),
+                lambda: self.finish(profiler, request),
+            )
+        else:
+            self.finish(profiler, request)
+        return response
+
+    def should_profile(self, request):
+        if request.META.get(PROFILE_HEADER) == "1":
+            return is_admin_request(request)
+        rate = settings.PROFILING_SAMPLE_RATE
+        return rate > 0 and random.random() < rate
+
+    def finish(self, profiler, request):
+        try:
+            view_name = get_view_name(request) or "unresolved"
+            path = os.path.join(
+                settings.PROFILING_DIR,
+                f"{view_name}-{time.time_ns()}-{os.getpid()}.prof",
+            )
+            profiler.dump_stats(path)
+            logger.info(
+                "Профиль %s %s сохранен в %s",
+                request.method,
+                request.path,
+                path,
+            )
+        finally:
+            self.slots.release()
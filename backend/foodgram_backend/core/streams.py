@@ -0,0 +1,33 @@
+"""Обертка тела потокового ответа для middleware."""
+
+END_OF_STREAM = object()
+
+
+class WrappedStream:
+    """Итератор тела потокового ответа, получающий части через call.
+
+    call(function, *args) вызывает function с аргументами, например
+    под профилировщиком или с учетом запросов к базе. on_finish
+    вызывается один раз: по окончании тела или при закрытии ответа
+    сервером.
+    """
+    def __init__(self, chunks, call, on_finish):
+        self.chunks = iter(chunks)
+        self.call = call
+        self.on_finish = on_finish
+        self.finished = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        chunk = self.call(next, self.chunks, END_OF_STREAM)
+        if chunk is END_OF_STREAM:
+            self.close()
+            raise StopIteration
+        return chunk
+
+    def close(self):
+        if not self.finished:
+            self.finished = True
+            self.on_finish()
@@ -0,0 +1,247 @@
+import json
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.checks import check_shared_cache
+from core.db_router import PIN_COOKIE, current_replica, use_primary
+from core.instrumentation import QueryBudgetExceeded
+from recipes.models import Recipe, ShoppingCart, Tag
+from users.models import User
+
+REPLICA = "replica"
+
+
+def is_recipe_count(sql):
+    return sql.startswith("SELECT COUNT(*)") and "recipes_recipe" in sql
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaRoutingTest(TransactionTestCase):
+    """Чтение из реплики и закрепление клиента за основной базой.
+
+    Реплика в тестах - зеркало основной базы, поэтому направление
+    запроса видно по соединению, через которое он выполнен.
+    TransactionTestCase нужен, чтобы реплика видела данные теста.
+    """
+    databases = {DEFAULT_DB_ALIAS, REPLICA}
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(
+            username="admin", email="admin@example.com", role="admin"
+        )
+        self.token = Token.objects.create(user=self.admin)
+        Recipe.objects.create(
+            author=self.admin, name="Рецепт", cooking_time=5
+        )
+
+    def request(self, client, method, url, data=None):
+        """Ответ и SQL, выполненный в основной базе и в реплике."""
+        with CaptureQueriesContext(
+            connections[DEFAULT_DB_ALIAS]
+        ) as primary, CaptureQueriesContext(connections[REPLICA]) as replica:
+            response = getattr(client, method)(url, data, format="json")
+        return response, (
+            [query["sql"] for query in primary.captured_queries],
+            [query["sql"] for query in replica.captured_queries],
+        )
+
+    def token_client(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        return client
+
+    def assertReadsFrom(self, client, alias):
+        response, (primary, replica) = self.request(
+            client, "get", "/api/recipes/"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 1)
+        # Промахи кеша рецептов перечитываются из основной базы, поэтому
+        # проверяется подсчет рецептов для пагинации.
+        used = replica if alias == REPLICA else primary
+        unused = primary if alias == REPLICA else replica
+        self.assertTrue(any(is_recipe_count(sql) for sql in used))
+        self.assertFalse(any(is_recipe_count(sql) for sql in unused))
+
+    def test_safe_api_requests_read_from_replica(self):
+        self.assertReadsFrom(APIClient(), REPLICA)
+        # Токен читается из основной базы, рецепты - из реплики.
+        response, (primary, replica) = self.request(
+            self.token_client(), "get", "/api/recipes/"
+        )
+        self.assertTrue(any("authtoken_token" in sql for sql in primary))
+        self.assertFalse(any("authtoken_token" in sql for sql in replica))
+        self.assertTrue(any(is_recipe_count(sql) for sql in replica))
+
+    def test_writes_go_to_primary(self):
+        response, (primary, replica) = self.request(
+            self.token_client(),
+            "post",
+            "/api/tags/",
+            {"name": "Суп", "color": "#FF0000", "slug": "soup"},
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertTrue(any(sql.startswith("INSERT") for sql in primary))
+        self.assertEqual(replica, [])
+
+    def test_reads_in_transaction_and_use_primary(self):
+        token = current_replica.set(REPLICA)
+        try:
+            self.assertEqual(Tag.objects.all().db, REPLICA)
+            with transaction.atomic():
+                self.assertEqual(Tag.objects.all().db, DEFAULT_DB_ALIAS)
+            with use_primary():
+                self.assertEqual(Tag.objects.all().db, DEFAULT_DB_ALIAS)
+            self.assertEqual(Tag.objects.all().db, REPLICA)
+            self.assertEqual(
+                Tag.objects.create(
+                    name="Суп", color="#FF0000", slug="soup"
+                )._state.db,
+                DEFAULT_DB_ALIAS,
+            )
+            self.assertEqual(Token.objects.all().db, DEFAULT_DB_ALIAS)
+        finally:
+            current_replica.reset(token)
+        self.assertEqual(Tag.objects.all().db, DEFAULT_DB_ALIAS)
+
+    def test_cookie_pins_client_to_primary(self):
+        client = self.token_client()
+        client.post(
+            "/api/tags/",
+            {"name": "Суп", "color": "#FF0000", "slug": "soup"},
+            format="json",
+        )
+        self.assertIn(PIN_COOKIE, client.cookies)
+        client.credentials()
+        self.assertReadsFrom(client, DEFAULT_DB_ALIAS)
+        del client.cookies[PIN_COOKIE]
+        self.assertReadsFrom(client, REPLICA)
+
+    def test_authorization_pins_other_clients_to_primary(self):
+        self.token_client().post(
+            "/api/tags/",
+            {"name": "Суп", "color": "#FF0000", "slug": "soup"},
+            format="json",
+        )
+        # Другой клиент с тем же токеном, но без cookie.
+        self.assertReadsFrom(self.token_client(), DEFAULT_DB_ALIAS)
+        self.assertReadsFrom(APIClient(), REPLICA)
+        cache.clear()
+        self.assertReadsFrom(self.token_client(), REPLICA)
+
+
+class SharedCacheCheckTest(SimpleTestCase):
+    """Проверка core.E001: кеш по умолчанию общий для процессов."""
+    def check(self, backend, **overrides):
+        options = {"DEBUG": False, "TESTING": False, **overrides}
+        # Сами кеши не пересоздаются: проверке нужна только настройка.
+        with override_settings(**options), mock.patch.dict(
+            settings.CACHES["default"], BACKEND=backend
+        ):
+            return [error.id for error in check_shared_cache(None)]
+
+    def test_process_local_cache(self):
+        self.assertEqual(
+            self.check("django.core.cache.backends.locmem.LocMemCache"),
+            ["core.E001"],
+        )
+
+    def test_shared_cache(self):
+        self.assertEqual(
+            self.check(
+                "django.core.cache.backends.memcached.PyMemcacheCache"
+            ),
+            [],
+        )
+
+    def test_debug(self):
+        self.assertEqual(
+            self.check(
+                "django.core.cache.backends.locmem.LocMemCache", DEBUG=True
+            ),
+            [],
+        )
+
+
+@override_settings(
+    REQUEST_INSTRUMENTATION=True,
+    METRICS_ENABLED=False,
+    QUERY_BUDGETS={},
+    QUERY_BUDGET_DEFAULT=None,
+    QUERY_BUDGET_ACTION="warn",
+)
+class QueryInstrumentationTest(TestCase):
+    """Server-Timing, строка лога и бюджет запросов к базе."""
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="user", email="user@example.com"
+        )
+        recipe = Recipe.objects.create(
+            author=self.user, name="Борщ", cooking_time=5
+        )
+        ShoppingCart.objects.create(user=self.user, recipe=recipe)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing(self):
+        with self.assertLogs("foodgram.requests", "INFO"):
+            response = self.client.get("/api/recipes/")
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(
+            response["Server-Timing"],
+            r'^db;dur=[\d.]+;desc="\d+ queries", '
+            r"serializer;dur=[\d.]+, total;dur=[\d.]+$",
+        )
+
+    def test_log(self):
+        with self.assertLogs("foodgram.requests", "INFO") as logs:
+            self.client.get("/api/recipes/")
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry["view"], "RecipeViewSet.list")
+        self.assertEqual(entry["status"], 200)
+        self.assertGreater(entry["queries"], 0)
+        self.assertEqual(
+            set(entry),
+            {
+                "method", "path", "view", "status", "queries", "db_ms",
+                "serializer_ms", "total_ms",
+            },
+        )
+
+    @override_settings(QUERY_BUDGETS={"RecipeViewSet.list": 0})
+    def test_budget_warning(self):
+        with self.assertLogs("foodgram.requests", "WARNING") as logs:
+            response = self.client.get("/api/recipes/")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("при бюджете 0", logs.output[0])
+
+    @override_settings(QUERY_BUDGET_DEFAULT=0, QUERY_BUDGET_ACTION="raise")
+    def test_budget_raise(self):
+        with self.assertLogs("foodgram.requests", "INFO"), self.assertRaises(
+            QueryBudgetExceeded
+        ):
+            self.client.get("/api/recipes/")
+
+    @override_settings(QUERY_BUDGET_DEFAULT=0, QUERY_BUDGET_ACTION="raise")
+    def test_streaming_budget_is_logged(self):
+        response = self.client.get("/api/recipes/download_shopping_cart/")
+        with self.assertLogs("foodgram.requests", "WARNING") as logs:
+            b"".join(response.streaming_content)
+        self.assertNotIn("Server-Timing", response)
+        self.assertIn(
+            "RecipeViewSet.download_shopping_cart", logs.output[0]
+        )
@@ -1,4 +1,5 @@
 import os
+import sys
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -39,6 +40,9 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "core.db_router.ReplicaRoutingMiddleware",
+    "core.instrumentation.QueryInstrumentationMiddleware",
+    "core.profiling.ProfilingMiddleware",
 ]
 
 ROOT_URLCONF = "foodgram_backend.urls"
@@ -76,6 +80,80 @@ DATABASES = {
     }
 }
 
+# Реплики для чтения (DB_REPLICA_HOSTS=host1,host2). Безопасные запросы
+# к API читают из реплики, после записи клиент REPLICA_PIN_SECONDS
+# секунд читает из основной базы.
+DATABASE_REPLICAS = []
+for number, host in enumerate(
+    filter(None, os.getenv("DB_REPLICA_HOSTS", "").split(",")), start=1
+):
+    DATABASES[f"replica_{number}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica_{number}")
+
+# В тестах реплика - зеркало основной базы. Чтение в нее направляют
+# только тесты маршрутизации (core/tests.py), задавая DATABASE_REPLICAS.
+TESTING = sys.argv[1:2] == ["test"]
+if TESTING:
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["core.db_router.ReplicaRouter"]
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", 5))
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+# В production с несколькими процессами gunicorn кеш по умолчанию должен
+# быть общим (memcached из infra/docker-compose.yml): в нем хранятся
+# версии рецептов и индексов. Без DEBUG кеш в памяти процесса не
+# проходит проверку core.E001.
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    },
+    "recipes": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "recipes",
+        "TIMEOUT": int(os.getenv("RECIPE_CACHE_TIMEOUT", 60 * 60)),
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.getenv("RECIPE_CACHE_MAX_ENTRIES", 5000)),
+        },
+    },
+}
+
+RECIPE_CACHE_ENABLED = (
+    os.getenv("RECIPE_CACHE_ENABLED", "True").lower() == "true"
+)
+RECIPE_CACHE_ALIAS = "recipes"
+# Отдавать рецепты из сохраненных в таблице карточек (Recipe.card)
+RECIPE_CARDS_ENABLED = (
+    os.getenv("RECIPE_CARDS_ENABLED", "False").lower() == "true"
+)
+
+# Максимальное количество подсказок при автодополнении ингредиентов
+INGREDIENT_AUTOCOMPLETE_LIMIT = int(
+    os.getenv("INGREDIENT_AUTOCOMPLETE_LIMIT", 10)
+)
+# Порог сходства и бюджет времени нечеткого поиска ингредиентов
+INGREDIENT_FUZZY_THRESHOLD = float(
+    os.getenv("INGREDIENT_FUZZY_THRESHOLD", 0.3)
+)
+INGREDIENT_FUZZY_BUDGET_MS = int(os.getenv("INGREDIENT_FUZZY_BUDGET_MS", 20))
+# Загружать индекс ингредиентов при старте процесса
+INGREDIENT_INDEX_PRELOAD = (
+    os.getenv("INGREDIENT_INDEX_PRELOAD", "True").lower() == "true"
+)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -133,12 +211,95 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.AllowAny",
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "users.authentication.CachedTokenAuthentication",
     ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 6,
 }
 
+# Рендерер и парсер JSON на orjson вместо стандартных (JSON_BACKEND=json)
+if os.getenv("JSON_BACKEND", "orjson") == "orjson":
+    REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"] = [
+        "api.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ]
+    REST_FRAMEWORK["DEFAULT_PARSER_CLASSES"] = [
+        "api.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ]
+
+# Кеш токенов аутентификации: размер и время жизни локального кеша
+# процесса и время жизни записей в общем кеше
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 1024))
+TOKEN_CACHE_LOCAL_TTL = int(os.getenv("TOKEN_CACHE_LOCAL_TTL", 5))
+TOKEN_CACHE_SHARED = os.getenv("TOKEN_CACHE_SHARED", "True").lower() == "true"
+TOKEN_CACHE_TTL = int(os.getenv("TOKEN_CACHE_TTL", 60))
+
+# Полнотекстовый поиск рецептов: конфигурация PostgreSQL и число
+# результатов поиска по индексу в памяти для остальных СУБД
+RECIPE_SEARCH_CONFIG = os.getenv("RECIPE_SEARCH_CONFIG", "russian")
+RECIPE_SEARCH_FALLBACK_LIMIT = int(
+    os.getenv("RECIPE_SEARCH_FALLBACK_LIMIT", 1000)
+)
+
+# Похожие рецепты: длина списка, вес сходства тегов относительно
+# ингредиентов и частота ингредиента, начиная с которой он не используется
+# для отбора кандидатов (соль, вода)
+SIMILAR_RECIPES_LIMIT = int(os.getenv("SIMILAR_RECIPES_LIMIT", 20))
+SIMILAR_RECIPES_TAG_WEIGHT = float(
+    os.getenv("SIMILAR_RECIPES_TAG_WEIGHT", 0.2)
+)
+SIMILAR_RECIPES_MAX_POSTINGS = int(
+    os.getenv("SIMILAR_RECIPES_MAX_POSTINGS", 1000)
+)
+
+# Время жизни кеша общего количества рецептов при курсорной пагинации
+RECIPE_FEED_COUNT_TIMEOUT = int(os.getenv("RECIPE_FEED_COUNT_TIMEOUT", 60))
+
+# Замер запросов к базе и времени сериализации (заголовок Server-Timing).
+# Бюджет запросов задается для представления вида "RecipeViewSet.list";
+# при превышении пишется предупреждение или, при "raise", исключение.
+REQUEST_INSTRUMENTATION = (
+    os.getenv("REQUEST_INSTRUMENTATION", str(DEBUG)).lower() == "true"
+)
+QUERY_BUDGETS = {
+    "RecipeViewSet.list": 6,
+    "RecipeViewSet.retrieve": 5,
+    "FollowListViewSet.list": 6,
+    "IngredientViewSet.list": 3,
+    "TagViewSet.list": 3,
+}
+QUERY_BUDGET_DEFAULT = None
+QUERY_BUDGET_ACTION = os.getenv("QUERY_BUDGET_ACTION", "warn")
+
+# Метрики Prometheus по адресу /api/metrics/: доступны администраторам,
+# по заголовку Authorization: Bearer METRICS_TOKEN
+# или с адресов из METRICS_ALLOWED_IPS
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "False").lower() == "true"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+METRICS_ALLOWED_IPS = [
+    ip for ip in os.getenv("METRICS_ALLOWED_IPS", "").split(",") if ip
+]
+
+# Профилирование запросов: по заголовку X-Profile: 1 от администратора
+# или для доли PROFILING_SAMPLE_RATE всех запросов
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "False").lower() == "true"
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", 0))
+PROFILING_DIR = os.getenv("PROFILING_DIR", BASE_DIR / "profiles")
+PROFILING_MAX_CONCURRENT = int(os.getenv("PROFILING_MAX_CONCURRENT", 2))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "foodgram": {"handlers": ["console"], "level": "INFO"},
+    },
+}
+
 
 DJOSER = {
     "LOGIN_FIELD": "email",
@@ -147,6 +308,8 @@ DJOSER = {
         "current_user": "api.serializers.UserSerializer",
     },
     "HIDE_USERS": False,
+    # Смена пароля удаляет токены пользователя.
+    "LOGOUT_ON_PASSWORD_CHANGE": True,
     "PERMISSIONS": {
         "user": ["rest_framework.permissions.AllowAny"],
         "user_list": ["rest_framework.permissions.AllowAny"],
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "foodgram_backend.settings")
 
 application = get_wsgi_application()
+
+from recipes.indexes import preload_indexes  # noqa: E402
+
+preload_indexes()
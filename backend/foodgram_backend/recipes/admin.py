@@ -86,10 +86,6 @@ class RecipeAdmin(admin.ModelAdmin):
         "name",
     )
 
-    @admin.display(description="Количество добавлений в избранное")
-    def favorites_count(self, object):
-        return Favorite.objects.filter(recipe=object).count()
-
 
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
@@ -0,0 +1,262 @@
+import re
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Count, F, Q
+
+from core.indexes import IncrementalIndex, VersionedIndex
+from recipes.models import Ingredient, IngredientRecipe, Tag
+
+
+def normalize(value):
+    """Приводит строку к виду для поиска без учета регистра и буквы ё."""
+    return value.casefold().replace("ё", "е").strip()
+
+
+def trigrams(value):
+    """Триграммы слов строки, дополненных пробелами, как в pg_trgm."""
+    result = set()
+    for word in re.findall(r"\w+", value):
+        word = f"  {word} "
+        result.update(word[i:i + 3] for i in range(len(word) - 2))
+    return result
+
+
+def clamp_limit(limit):
+    """Число подсказок в пределах 1..INGREDIENT_AUTOCOMPLETE_LIMIT."""
+    maximum = settings.INGREDIENT_AUTOCOMPLETE_LIMIT
+    if limit is None:
+        return maximum
+    return max(1, min(limit, maximum))
+
+
+class IngredientIndex(VersionedIndex):
+    """Отсортированный индекс ингредиентов для автодополнения."""
+    version_key = "ingredient-index-version"
+
+    def build(self):
+        return self.build_from_rows(
+            Ingredient.objects.values_list("pk", "name", "measurement_unit")
+        )
+
+    @staticmethod
+    def build_from_rows(rows):
+        rows = sorted(
+            (normalize(name), pk, name, measurement_unit)
+            for pk, name, measurement_unit in rows
+        )
+        keys = [row[0] for row in rows]
+        postings = defaultdict(list)
+        trigram_counts = []
+        for index, key in enumerate(keys):
+            key_trigrams = trigrams(key)
+            trigram_counts.append(len(key_trigrams))
+            for trigram in key_trigrams:
+                postings[trigram].append(index)
+        return {
+            "keys": keys,
+            "items": [
+                {"id": pk, "name": name, "measurement_unit": unit}
+                for _, pk, name, unit in rows
+            ],
+            "postings": dict(postings),
+            "trigram_counts": trigram_counts,
+        }
+
+    def autocomplete(self, query, limit=None):
+        """Ингредиенты, начинающиеся с query, а затем содержащие его."""
+        limit = clamp_limit(limit)
+        query = normalize(query)
+        data = self.get()
+        keys, items = data["keys"], data["items"]
+        if not query:
+            return items[:limit]
+        result = []
+        start = bisect_left(keys, query)
+        end = start
+        while (
+            end < len(keys)
+            and keys[end].startswith(query)
+            and len(result) < limit
+        ):
+            result.append(items[end])
+            end += 1
+        if len(result) < limit:
+            substring_matches = sorted(
+                (key.find(query), key, index)
+                for index, key in enumerate(keys)
+                if not start <= index < end and query in key
+            )
+            result.extend(
+                items[index] for _, _, index in substring_matches
+            )
+        return result[:limit]
+
+    def fuzzy(self, query, limit=None):
+        """Ингредиенты, похожие на query, по убыванию сходства триграмм.
+
+        Поиск прекращается по истечении INGREDIENT_FUZZY_BUDGET_MS,
+        тогда возвращается лучшее из уже найденного.
+        """
+        limit = clamp_limit(limit)
+        deadline = (
+            time.monotonic() + settings.INGREDIENT_FUZZY_BUDGET_MS / 1000
+        )
+        query_trigrams = trigrams(normalize(query))
+        data = self.get()
+        postings, trigram_counts = data["postings"], data["trigram_counts"]
+        shared = Counter()
+        # Редкие триграммы сильнее отсекают кандидатов, их считаем первыми.
+        for trigram in sorted(
+            query_trigrams, key=lambda item: len(postings.get(item, ()))
+        ):
+            shared.update(postings.get(trigram, ()))
+            if time.monotonic() > deadline:
+                break
+        scored = []
+        for index, count in shared.items():
+            similarity = count / (
+                len(query_trigrams) + trigram_counts[index] - count
+            )
+            if similarity >= settings.INGREDIENT_FUZZY_THRESHOLD:
+                scored.append((-similarity, data["keys"][index], index))
+        scored.sort()
+        return [data["items"][index] for _, _, index in scored[:limit]]
+
+
+ingredient_index = IngredientIndex()
+
+
+class TagSlugIndex(VersionedIndex):
+    """Соответствие slug тега его идентификатору."""
+    version_key = "tag-slug-index-version"
+
+    def build(self):
+        return dict(Tag.objects.values_list("slug", "pk"))
+
+
+tag_slug_index = TagSlugIndex()
+
+
+class RecipeIngredientIndex(IncrementalIndex):
+    """Инвертированный индекс: ингредиент -> отсортированные id рецептов.
+
+    Изменение ингредиентов рецепта обновляет только его записи.
+    """
+    version_key = "recipe-ingredient-index-version"
+
+    def build(self):
+        postings = defaultdict(lambda: array("q"))
+        totals = Counter()
+        for recipe_id, ingredient_id in (
+            IngredientRecipe.objects.order_by("ingredient_id", "recipe_id")
+            .values_list("recipe_id", "ingredient_id")
+            .iterator()
+        ):
+            postings[ingredient_id].append(recipe_id)
+            totals[recipe_id] += 1
+        return {"postings": dict(postings), "totals": dict(totals)}
+
+    def update(self, data, recipe_ids):
+        """Копия данных с перечитанными ингредиентами рецептов."""
+        recipe_ids = set(recipe_ids)
+        added = defaultdict(list)
+        counts = Counter()
+        for recipe_id, ingredient_id in IngredientRecipe.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list("recipe_id", "ingredient_id"):
+            added[ingredient_id].append(recipe_id)
+            counts[recipe_id] += 1
+        postings = dict(data["postings"])
+        totals = dict(data["totals"])
+        indexed = [
+            recipe_id for recipe_id in recipe_ids
+            if totals.pop(recipe_id, None)
+        ]
+        changed = set(added)
+        if indexed:
+            for ingredient_id, recipes in postings.items():
+                for recipe_id in indexed:
+                    position = bisect_left(recipes, recipe_id)
+                    if (
+                        position < len(recipes)
+                        and recipes[position] == recipe_id
+                    ):
+                        changed.add(ingredient_id)
+                        break
+        for ingredient_id in changed:
+            recipes = array("q", sorted(
+                [
+                    recipe_id
+                    for recipe_id in postings.get(ingredient_id, ())
+                    if recipe_id not in recipe_ids
+                ] + added.get(ingredient_id, [])
+            ))
+            if recipes:
+                postings[ingredient_id] = recipes
+            else:
+                postings.pop(ingredient_id, None)
+        totals.update(counts)
+        return {"postings": postings, "totals": totals}
+
+    def cookable(self, ingredient_ids, max_missing=None):
+        """Рецепты хотя бы с одним из ингредиентов ingredient_ids.
+
+        Возвращает список (рецепт, недостает, есть) или None, пока
+        индекс строится.
+        """
+        data = self.get(block=False)
+        if data is None:
+            return None
+        matched = Counter()
+        for ingredient_id in set(ingredient_ids):
+            matched.update(data["postings"].get(ingredient_id, ()))
+        rows = [
+            (recipe_id, data["totals"][recipe_id] - count, count)
+            for recipe_id, count in matched.items()
+        ]
+        if max_missing is not None:
+            rows = [row for row in rows if row[1] <= max_missing]
+        rows.sort(key=lambda row: (row[1], -row[2], -row[0]))
+        return rows
+
+
+recipe_ingredient_index = RecipeIngredientIndex()
+
+
+def cookable_recipes(ingredient_ids, max_missing=None):
+    """Рецепты по возрастанию числа недостающих ингредиентов.
+
+    Пока индекс в памяти не построен, используется один запрос
+    с группировкой по рецептам.
+    """
+    rows = recipe_ingredient_index.cookable(ingredient_ids, max_missing)
+    if rows is not None:
+        return rows
+    rows = (
+        IngredientRecipe.objects.values("recipe_id")
+        .annotate(
+            matched=Count("pk", filter=Q(ingredient_id__in=ingredient_ids)),
+            missing=Count("pk") - F("matched"),
+        )
+        .filter(matched__gt=0)
+    )
+    if max_missing is not None:
+        rows = rows.filter(missing__lte=max_missing)
+    return rows.order_by("missing", "-matched", "-recipe_id").values_list(
+        "recipe_id", "missing", "matched"
+    )
+
+
+def preload_indexes():
+    """Строит индексы при старте процесса, если это включено в настройках."""
+    if not settings.INGREDIENT_INDEX_PRELOAD:
+        return
+    try:
+        ingredient_index.get()
+    except DatabaseError:
+        pass
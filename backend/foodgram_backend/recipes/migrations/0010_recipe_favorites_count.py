@@ -0,0 +1,49 @@
+# Generated by Django 3.2.3 on 2026-10-18 17:58
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model, field):
+    return Coalesce(
+        models.Subquery(
+            model.objects.filter(**{field: models.OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=models.Count("pk"))
+            .values("total")
+        ),
+        0,
+    )
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model("recipes", "Recipe")
+    Favorite = apps.get_model("recipes", "Favorite")
+    Follow = apps.get_model("recipes", "Follow")
+    User = apps.get_model("users", "User")
+    Recipe.objects.update(favorites_count=count_subquery(Favorite, "recipe"))
+    User.objects.update(
+        recipes_count=count_subquery(Recipe, "author"),
+        followers_count=count_subquery(Follow, "following"),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0009_auto_20231022_2105"),
+        ("users", "0003_user_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="favorites_count",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                verbose_name="Количество добавлений в избранное",
+            ),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
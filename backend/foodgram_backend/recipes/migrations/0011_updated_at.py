@@ -0,0 +1,41 @@
+# Generated by Django 3.2.3 on 2026-10-18 18:01
+
+from django.db import migrations, models
+
+
+def fill_updated_at(apps, schema_editor):
+    for model_name in ("Ingredient", "Recipe", "Tag"):
+        apps.get_model("recipes", model_name).objects.update(
+            updated_at=models.F("pub_date")
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0010_recipe_favorites_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ingredient",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, help_text="Дата изменения", verbose_name="Дата изменения"
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, help_text="Дата изменения", verbose_name="Дата изменения"
+            ),
+        ),
+        migrations.AddField(
+            model_name="tag",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, help_text="Дата изменения", verbose_name="Дата изменения"
+            ),
+        ),
+        migrations.RunPython(fill_updated_at, migrations.RunPython.noop),
+    ]
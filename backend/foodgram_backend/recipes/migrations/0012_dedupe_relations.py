@@ -0,0 +1,44 @@
+# Generated by Django 3.2.3 on 2026-10-18 18:12
+
+from django.db import migrations, models
+
+
+def merge_duplicates(model, field, merge_amount=False):
+    """Оставляет по одной связи на пару (рецепт, field).
+
+    Для ингредиентов количество оставшейся связи равно сумме дублей,
+    чтобы список покупок не изменился.
+    """
+    aggregates = {"keep_id": models.Min("id"), "rows": models.Count("id")}
+    if merge_amount:
+        aggregates["total"] = models.Sum("amount")
+    duplicates = (
+        model.objects.values("recipe", field).annotate(**aggregates).filter(rows__gt=1)
+    )
+    for duplicate in list(duplicates):
+        if merge_amount:
+            model.objects.filter(pk=duplicate["keep_id"]).update(
+                amount=duplicate["total"]
+            )
+        model.objects.filter(
+            recipe=duplicate["recipe"], **{field: duplicate[field]}
+        ).exclude(pk=duplicate["keep_id"]).delete()
+
+
+def dedupe_relations(apps, schema_editor):
+    merge_duplicates(
+        apps.get_model("recipes", "IngredientRecipe"),
+        "ingredient",
+        merge_amount=True,
+    )
+    merge_duplicates(apps.get_model("recipes", "TagRecipe"), "tag")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0011_updated_at"),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_relations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 3.2.3 on 2026-10-18 18:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0012_dedupe_relations"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="ingredientrecipe",
+            index=models.Index(
+                fields=["ingredient", "recipe"], name="ingredientrecipe_reverse_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["-pub_date", "-id"], name="recipe_pub_date_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["author", "-pub_date"], name="recipe_author_pub_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tagrecipe",
+            index=models.Index(fields=["tag", "recipe"], name="tagrecipe_reverse_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="ingredientrecipe",
+            constraint=models.UniqueConstraint(
+                fields=("recipe", "ingredient"), name="unique_recipe_ingredient"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="tagrecipe",
+            constraint=models.UniqueConstraint(
+                fields=("recipe", "tag"), name="unique_recipe_tag"
+            ),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 3.2.3 on 2026-10-18 18:14
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+INDEX_NAME = "recipe_search_vector_idx"
+
+
+def create_search_index(apps, schema_editor):
+    """GIN-индекс и заполнение search_vector, только для PostgreSQL."""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        f"CREATE INDEX {INDEX_NAME} ON recipes_recipe USING gin (search_vector)"
+    )
+    config = settings.RECIPE_SEARCH_CONFIG
+    apps.get_model("recipes", "Recipe").objects.update(
+        search_vector=SearchVector("name", weight="A", config=config)
+        + SearchVector("text", weight="B", config=config)
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0013_relation_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.3 on 2026-10-18 18:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0014_recipe_search_vector"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="card",
+            field=models.TextField(editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 3.2.3 on 2026-10-18 18:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0015_recipe_card"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SimilarRecipe",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("score", models.FloatField(verbose_name="Сходство")),
+                (
+                    "recipe",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="similar_recipes",
+                        to="recipes.recipe",
+                    ),
+                ),
+                (
+                    "similar",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="similar_for",
+                        to="recipes.recipe",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="similarrecipe",
+            index=models.Index(
+                fields=["recipe", "-score"], name="similarrecipe_score_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="similarrecipe",
+            constraint=models.UniqueConstraint(
+                fields=("recipe", "similar"), name="unique_similar_recipe"
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.3 on 2026-10-18 18:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0016_similarrecipe'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StaleSimilarRecipe',
+            fields=[
+                ('recipe_id', models.BigIntegerField(primary_key=True, serialize=False)),
+            ],
+        ),
+    ]
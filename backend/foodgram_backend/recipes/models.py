@@ -1,8 +1,11 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
 from django.core.validators import MinValueValidator
 from django.contrib.auth import get_user_model
 
-from core.models import CreatedModel
+from core.models import CountersMixin, CreatedModel, UpdatedModel
 from core.validators import validate_slug
 
 
@@ -13,7 +16,7 @@ SLUG_LENGTH = 200
 User = get_user_model()
 
 
-class Tag(CreatedModel):
+class Tag(CreatedModel, UpdatedModel):
     """Модель тегов."""
     name = models.CharField(
         "Название тега",
@@ -37,8 +40,86 @@ class Tag(CreatedModel):
         return self.name[0:15]
 
 
-class Recipe(CreatedModel):
+def recipe_prefetches():
+    """Связанные объекты, необходимые для отображения рецепта."""
+    return (
+        models.Prefetch(
+            "ingredient_recipe",
+            queryset=IngredientRecipe.objects.select_related("ingredient"),
+        ),
+        models.Prefetch(
+            "tag_recipe",
+            queryset=TagRecipe.objects.select_related("tag"),
+        ),
+    )
+
+
+class RecipeQuerySet(models.QuerySet):
+    """Запросы к рецептам с аннотациями для текущего пользователя."""
+
+    def with_related(self):
+        return self.prefetch_related(*recipe_prefetches())
+
+    def latest_for_authors(self, author_ids, limit=None):
+        """Последние limit рецептов каждого автора одним запросом."""
+        recipes = self.filter(author_id__in=author_ids)
+        if limit is not None:
+            ranked = recipes.annotate(
+                row_number=models.Window(
+                    expression=RowNumber(),
+                    partition_by=models.F("author_id"),
+                    order_by=(
+                        models.F("pub_date").desc(),
+                        models.F("id").desc(),
+                    ),
+                )
+            ).order_by().values("pk", "row_number")
+            sql, params = ranked.query.sql_with_params()
+            recipes = recipes.filter(
+                pk__in=RawSQL(
+                    f"SELECT id FROM ({sql}) ranked WHERE row_number <= %s",
+                    (*params, limit),
+                )
+            )
+        return recipes.order_by("-pub_date", "-id")
+
+    def with_user_flags(self, user):
+        """Добавляет флаги is_favorited, is_in_shopping_cart
+        и author_is_subscribed."""
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+                is_in_shopping_cart=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+                author_is_subscribed=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+            )
+        return self.annotate(
+            is_favorited=models.Exists(
+                Favorite.objects.filter(
+                    user=user, recipe=models.OuterRef("pk")
+                )
+            ),
+            is_in_shopping_cart=models.Exists(
+                ShoppingCart.objects.filter(
+                    user=user, recipe=models.OuterRef("pk")
+                )
+            ),
+            author_is_subscribed=models.Exists(
+                Follow.objects.filter(
+                    user=user, following=models.OuterRef("author")
+                )
+            ),
+        )
+
+
+class Recipe(CountersMixin, CreatedModel, UpdatedModel):
     """Модель рецептов."""
+    counter_fields = ("favorites_count",)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -70,15 +151,43 @@ class Recipe(CreatedModel):
     cooking_time = models.PositiveIntegerField(
         validators=[MinValueValidator(1)],
     )
+    favorites_count = models.PositiveIntegerField(
+        "Количество добавлений в избранное",
+        default=0,
+        editable=False,
+    )
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Готовое представление рецепта без пользовательских полей, NULL -
+    # устарело. Текст, а не JSONField: jsonb не сохраняет порядок ключей.
+    card = models.TextField(null=True, editable=False)
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ("-pub_date",)
+        indexes = [
+            models.Index(
+                fields=["-pub_date", "-id"], name="recipe_pub_date_id_idx"
+            ),
+            models.Index(
+                fields=["author", "-pub_date"],
+                name="recipe_author_pub_date_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.name[0:15]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Автор на момент чтения: при его смене сигнал пересчитывает
+        # счетчики рецептов без повторного чтения из базы.
+        instance._loaded_author_id = instance.__dict__.get("author_id")
+        return instance
+
 
-class Ingredient(CreatedModel):
+class Ingredient(CreatedModel, UpdatedModel):
     """Модель ингредиентов."""
     name = models.CharField(
         "Название ингредиента",
@@ -110,6 +219,20 @@ class IngredientRecipe(models.Model):
         default=1
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recipe", "ingredient"],
+                name="unique_recipe_ingredient",
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["ingredient", "recipe"],
+                name="ingredientrecipe_reverse_idx",
+            ),
+        ]
+
 
 class TagRecipe(models.Model):
     """Модель связи тегов и рецептов."""
@@ -124,6 +247,18 @@ class TagRecipe(models.Model):
         related_name="tag_recipe",
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recipe", "tag"], name="unique_recipe_tag"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["tag", "recipe"], name="tagrecipe_reverse_idx"
+            ),
+        ]
+
 
 class Follow(CreatedModel):
     """Модель подписок на пользователей."""
@@ -195,3 +330,37 @@ class ShoppingCart(CreatedModel):
             f"Корзина пользователя {self.user.username} - "
             f"рецепт {self.recipe.name}"
         )
+
+
+class SimilarRecipe(models.Model):
+    """Предрассчитанный похожий рецепт (см. recipes.similarity)."""
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="similar_recipes",
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="similar_for",
+    )
+    score = models.FloatField("Сходство")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recipe", "similar"], name="unique_similar_recipe"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["recipe", "-score"], name="similarrecipe_score_idx"
+            ),
+        ]
+
+
+class StaleSimilarRecipe(models.Model):
+    """Рецепт, похожие рецепты которого нужно пересчитать."""
+    # Не внешний ключ: рецепт отмечается и при удалении его ингредиентов
+    # вместе с самим рецептом.
+    recipe_id = models.BigIntegerField(primary_key=True)
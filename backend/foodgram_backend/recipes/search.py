@@ -0,0 +1,147 @@
+"""Полнотекстовый поиск рецептов по названию и описанию.
+
+В PostgreSQL используется столбец Recipe.search_vector с GIN-индексом,
+в остальных СУБД (SQLite в тестах) - инвертированный индекс в памяти.
+"""
+import math
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+)
+from django.db import connection
+from django.db.models import Case, F, IntegerField, When
+
+from core.indexes import VersionedIndex
+from recipes.indexes import normalize
+from recipes.models import Recipe
+
+SEARCH_FIELDS = {"name", "text"}
+NAME_WEIGHT = 2
+TEXT_WEIGHT = 1
+
+RUSSIAN_ENDINGS = sorted(
+    "иями ями ами ого его ому ему ыми ими ая яя ое ее ые ие ый ий ой ей ую "
+    "юю ом ем ам ям ах ях ов ев ию ия ии ью а я о е ы и у ю ь й".split(),
+    key=len,
+    reverse=True,
+)
+MIN_STEM_LENGTH = 3
+
+
+def uses_search_vector():
+    return connection.vendor == "postgresql"
+
+
+def stem(word):
+    """Упрощенный стемминг: отбрасывает типичное русское окончание."""
+    for ending in RUSSIAN_ENDINGS:
+        if (
+            word.endswith(ending)
+            and len(word) - len(ending) >= MIN_STEM_LENGTH
+        ):
+            return word[:-len(ending)]
+    return word
+
+
+def terms(value):
+    return [stem(word) for word in re.findall(r"\w{2,}", normalize(value))]
+
+
+def search_vector():
+    config = settings.RECIPE_SEARCH_CONFIG
+    return SearchVector("name", weight="A", config=config) + SearchVector(
+        "text", weight="B", config=config
+    )
+
+
+class RecipeSearchIndex(VersionedIndex):
+    """Инвертированный индекс рецептов для СУБД без полнотекстового поиска.
+
+    Вес термина - TF-IDF, слова названия весят больше слов описания.
+    """
+    version_key = "recipe-search-index-version"
+
+    def build(self):
+        postings = defaultdict(lambda: defaultdict(int))
+        total = 0
+        for pk, name, text in Recipe.objects.values_list("pk", "name", "text"):
+            total += 1
+            for term in terms(name):
+                postings[term][pk] += NAME_WEIGHT
+            for term in terms(text):
+                postings[term][pk] += TEXT_WEIGHT
+        return {
+            term: {
+                "idf": math.log(1 + total / len(recipes)),
+                "recipes": dict(recipes),
+            }
+            for term, recipes in postings.items()
+        }
+
+    def search(self, query, limit):
+        """Идентификаторы рецептов со всеми словами query по релевантности."""
+        query_terms = set(terms(query))
+        if not query_terms:
+            return []
+        data = self.get()
+        matches = [data.get(term) for term in query_terms]
+        if not all(matches):
+            return []
+        matches.sort(key=lambda match: len(match["recipes"]))
+        scores = {
+            pk: weight * matches[0]["idf"]
+            for pk, weight in matches[0]["recipes"].items()
+        }
+        for match in matches[1:]:
+            scores = {
+                pk: score + match["recipes"][pk] * match["idf"]
+                for pk, score in scores.items()
+                if pk in match["recipes"]
+            }
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+        return [pk for pk, _ in ranked[:limit]]
+
+
+recipe_search_index = RecipeSearchIndex()
+
+
+def refresh_search(recipe_ids):
+    """Обновляет поисковые данные рецептов после изменения."""
+    if uses_search_vector():
+        Recipe.objects.filter(pk__in=recipe_ids).update(
+            search_vector=search_vector()
+        )
+    else:
+        recipe_search_index.invalidate()
+
+
+def search_recipes(queryset, query):
+    """Рецепты queryset, найденные по query, по убыванию релевантности."""
+    if uses_search_vector():
+        search_query = SearchQuery(
+            query,
+            config=settings.RECIPE_SEARCH_CONFIG,
+            search_type="websearch",
+        )
+        return (
+            queryset.filter(search_vector=search_query)
+            .annotate(rank=SearchRank(F("search_vector"), search_query))
+            .order_by("-rank", "-pub_date", "-id")
+        )
+    recipe_ids = recipe_search_index.search(
+        query, settings.RECIPE_SEARCH_FALLBACK_LIMIT
+    )
+    return queryset.filter(pk__in=recipe_ids).order_by(
+        Case(
+            *(
+                When(pk=pk, then=position)
+                for position, pk in enumerate(recipe_ids)
+            ),
+            output_field=IntegerField(),
+        )
+    )
@@ -0,0 +1,114 @@
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from recipes.indexes import ingredient_index, tag_slug_index
+from recipes.models import (
+    Favorite,
+    Follow,
+    Ingredient,
+    Recipe,
+    Tag,
+)
+from recipes.search import SEARCH_FIELDS, recipe_search_index, refresh_search
+
+User = get_user_model()
+
+
+def change_counter(queryset, field, delta):
+    """Атомарно изменяет денормализованный счетчик на delta."""
+    if delta < 0:
+        queryset = queryset.filter(**{f"{field}__gt": 0})
+    queryset.update(**{field: F(field) + delta})
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            Recipe.objects.filter(pk=instance.recipe_id), "favorites_count", 1
+        )
+
+
+@receiver(post_delete, sender=Favorite)
+def favorite_deleted(sender, instance, **kwargs):
+    change_counter(
+        Recipe.objects.filter(pk=instance.recipe_id), "favorites_count", -1
+    )
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_recipe_author(sender, instance, update_fields, **kwargs):
+    instance._previous_author_id = None
+    if instance._state.adding or (
+        update_fields is not None
+        and not {"author", "author_id"} & update_fields
+    ):
+        return
+    previous_author_id = getattr(instance, "_loaded_author_id", None)
+    if previous_author_id is None:
+        # Рецепт прочитан без автора.
+        previous_author_id = (
+            Recipe.objects.filter(pk=instance.pk)
+            .values_list("author_id", flat=True)
+            .first()
+        )
+    instance._previous_author_id = previous_author_id
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, update_fields, **kwargs):
+    if update_fields is None or SEARCH_FIELDS & set(update_fields):
+        refresh_search([instance.pk])
+    previous_author_id = instance._previous_author_id
+    instance._loaded_author_id = instance.__dict__.get("author_id")
+    if created:
+        change_counter(
+            User.objects.filter(pk=instance.author_id), "recipes_count", 1
+        )
+    elif previous_author_id and previous_author_id != instance.author_id:
+        change_counter(
+            User.objects.filter(pk=previous_author_id), "recipes_count", -1
+        )
+        change_counter(
+            User.objects.filter(pk=instance.author_id), "recipes_count", 1
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    recipe_search_index.invalidate()
+    change_counter(
+        User.objects.filter(pk=instance.author_id), "recipes_count", -1
+    )
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            User.objects.filter(pk=instance.following_id),
+            "followers_count",
+            1,
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    change_counter(
+        User.objects.filter(pk=instance.following_id), "followers_count", -1
+    )
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    ingredient_index.invalidate()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(sender, **kwargs):
+    tag_slug_index.invalidate()
+
@@ -0,0 +1,224 @@
+"""Похожие рецепты по пересечению ингредиентов и тегов.
+
+Сходство - взвешенная сумма коэффициентов Жаккара множеств ингредиентов
+и тегов. Кандидаты отбираются по инвертированному индексу ингредиентов:
+это рецепты хотя бы с одним общим ингредиентом, кроме самых частых
+(SIMILAR_RECIPES_MAX_POSTINGS), которые учитываются только в сходстве.
+Результат хранится в таблице SimilarRecipe. Изменившиеся рецепты
+отмечаются в StaleSimilarRecipe и пересчитываются командой
+build_similar_recipes --stale вне обработки запросов.
+"""
+import heapq
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min, Q
+
+from recipes.models import (
+    IngredientRecipe,
+    SimilarRecipe,
+    StaleSimilarRecipe,
+    TagRecipe,
+)
+
+
+def load_sets(model, field, recipe_ids=None):
+    """Словарь рецепт -> множество значений field связей model."""
+    rows = model.objects.all()
+    if recipe_ids is not None:
+        rows = rows.filter(recipe_id__in=recipe_ids)
+    sets = defaultdict(set)
+    for recipe_id, value in rows.values_list("recipe_id", field).iterator():
+        sets[recipe_id].add(value)
+    return sets
+
+
+def jaccard(first, second):
+    common = len(first & second)
+    union = len(first) + len(second) - common
+    return common / union if union else 0.0
+
+
+class Similarity:
+    """Ингредиенты и теги рецептов с инвертированным индексом."""
+    def __init__(self, ingredients, tags, frequent):
+        self.ingredients = ingredients
+        self.tags = tags
+        self.frequent = frequent
+        self.tag_weight = settings.SIMILAR_RECIPES_TAG_WEIGHT
+        self.postings = defaultdict(list)
+        for recipe_id, ingredient_ids in ingredients.items():
+            for ingredient_id in ingredient_ids - frequent:
+                self.postings[ingredient_id].append(recipe_id)
+
+    def score(self, first, second):
+        return (1 - self.tag_weight) * jaccard(
+            self.ingredients[first], self.ingredients[second]
+        ) + self.tag_weight * jaccard(
+            self.tags.get(first, set()), self.tags.get(second, set())
+        )
+
+    def neighbours(self, recipe_id, limit):
+        """Не более limit пар (рецепт, сходство) по убыванию сходства."""
+        candidates = set()
+        for ingredient_id in self.ingredients[recipe_id] - self.frequent:
+            candidates.update(self.postings[ingredient_id])
+        candidates.discard(recipe_id)
+        return heapq.nlargest(
+            limit,
+            (
+                (candidate, self.score(recipe_id, candidate))
+                for candidate in candidates
+            ),
+            key=lambda item: (item[1], item[0]),
+        )
+
+
+def rebuild(batch_size=1000):
+    """Пересчитывает таблицу похожих рецептов целиком.
+
+    Снимаются только отметки, сделанные до чтения связей: рецепты,
+    отмеченные во время пересчета, останутся для update_stale().
+    """
+    stale_ids = list(
+        StaleSimilarRecipe.objects.values_list("pk", flat=True)
+    )
+    ingredients = load_sets(IngredientRecipe, "ingredient_id")
+    counts = defaultdict(int)
+    for ingredient_ids in ingredients.values():
+        for ingredient_id in ingredient_ids:
+            counts[ingredient_id] += 1
+    similarity = Similarity(
+        ingredients,
+        load_sets(TagRecipe, "tag_id"),
+        {
+            ingredient_id
+            for ingredient_id, count in counts.items()
+            if count > settings.SIMILAR_RECIPES_MAX_POSTINGS
+        },
+    )
+    recipe_ids = sorted(ingredients)
+    total = 0
+    with transaction.atomic():
+        for start in range(0, len(stale_ids), batch_size):
+            StaleSimilarRecipe.objects.filter(
+                pk__in=stale_ids[start:start + batch_size]
+            ).delete()
+        SimilarRecipe.objects.all().delete()
+        for start in range(0, len(recipe_ids), batch_size):
+            rows = [
+                SimilarRecipe(
+                    recipe_id=recipe_id, similar_id=other, score=score
+                )
+                for recipe_id in recipe_ids[start:start + batch_size]
+                for other, score in similarity.neighbours(
+                    recipe_id, settings.SIMILAR_RECIPES_LIMIT
+                )
+            ]
+            SimilarRecipe.objects.bulk_create(rows)
+            total += len(rows)
+    return total
+
+
+def mark_stale(recipe_ids):
+    """Отмечает рецепты для пересчета командой build_similar_recipes."""
+    StaleSimilarRecipe.objects.bulk_create(
+        (StaleSimilarRecipe(recipe_id=recipe_id) for recipe_id in recipe_ids),
+        ignore_conflicts=True,
+    )
+
+
+def update_stale(batch_size=1000):
+    """Пересчитывает похожие рецепты для отмеченных рецептов.
+
+    Отметка снимается до пересчета, поэтому рецепт, измененный во время
+    него, будет отмечен снова и пересчитан при следующем запуске.
+    """
+    total = 0
+    while True:
+        recipe_ids = list(
+            StaleSimilarRecipe.objects.order_by("pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not recipe_ids:
+            return total
+        StaleSimilarRecipe.objects.filter(pk__in=recipe_ids).delete()
+        update_recipes(recipe_ids)
+        total += len(recipe_ids)
+
+
+def update_recipes(recipe_ids):
+    """Пересчитывает похожие рецепты после изменения ингредиентов.
+
+    Рецепты также добавляются в списки своих соседей, если входят в их
+    первые SIMILAR_RECIPES_LIMIT. Места, освободившиеся в чужих списках,
+    заполняет только полный пересчет (rebuild).
+    """
+    recipe_ids = set(recipe_ids)
+    limit = settings.SIMILAR_RECIPES_LIMIT
+    own = load_sets(IngredientRecipe, "ingredient_id", recipe_ids)
+    used = set().union(*own.values())
+    frequent = set(
+        IngredientRecipe.objects.filter(ingredient_id__in=used)
+        .values("ingredient_id")
+        .annotate(total=Count("pk"))
+        .filter(total__gt=settings.SIMILAR_RECIPES_MAX_POSTINGS)
+        .values_list("ingredient_id", flat=True)
+    )
+    candidates = recipe_ids | set(
+        IngredientRecipe.objects.filter(ingredient_id__in=used - frequent)
+        .values_list("recipe_id", flat=True)
+        .distinct()
+    )
+    similarity = Similarity(
+        load_sets(IngredientRecipe, "ingredient_id", candidates),
+        load_sets(TagRecipe, "tag_id", candidates),
+        frequent,
+    )
+    rows = []
+    reverse = []
+    for recipe_id in recipe_ids & set(similarity.ingredients):
+        for other, score in similarity.neighbours(recipe_id, limit):
+            rows.append(
+                SimilarRecipe(
+                    recipe_id=recipe_id, similar_id=other, score=score
+                )
+            )
+            if other not in recipe_ids:
+                reverse.append(
+                    SimilarRecipe(
+                        recipe_id=other, similar_id=recipe_id, score=score
+                    )
+                )
+    with transaction.atomic():
+        SimilarRecipe.objects.filter(
+            Q(recipe_id__in=recipe_ids) | Q(similar_id__in=recipe_ids)
+        ).delete()
+        lists = {
+            row["recipe_id"]: row
+            for row in SimilarRecipe.objects.filter(
+                recipe_id__in={row.recipe_id for row in reverse}
+            )
+            .values("recipe_id")
+            .annotate(total=Count("pk"), lowest=Min("score"))
+        }
+        overfilled = set()
+        for row in reverse:
+            current = lists.setdefault(
+                row.recipe_id, {"total": 0, "lowest": row.score}
+            )
+            if current["total"] < limit or row.score > current["lowest"]:
+                rows.append(row)
+                current["total"] += 1
+                if current["total"] > limit:
+                    overfilled.add(row.recipe_id)
+        SimilarRecipe.objects.bulk_create(rows)
+        for recipe_id in overfilled:
+            SimilarRecipe.objects.filter(
+                pk__in=list(
+                    SimilarRecipe.objects.filter(recipe_id=recipe_id)
+                    .order_by("-score", "-similar_id")
+                    .values_list("pk", flat=True)[limit:]
+                )
+            ).delete()
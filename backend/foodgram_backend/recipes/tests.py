@@ -0,0 +1,262 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from recipes import similarity
+from recipes.indexes import RecipeIngredientIndex
+from recipes.search import recipe_search_index, search_recipes
+from recipes.models import (
+    Ingredient,
+    IngredientRecipe,
+    Recipe,
+    SimilarRecipe,
+    StaleSimilarRecipe,
+    Tag,
+    TagRecipe,
+)
+from users.models import User
+
+
+class RecipeIngredientIndexTest(TestCase):
+    """Индекс ингредиентов рецептов обновляется без перестроения.
+
+    Отдельный экземпляр индекса читает общий журнал изменений так же,
+    как копия индекса в другом процессе.
+    """
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user(
+            username="author", email="author@example.com"
+        )
+        self.ingredients = [
+            Ingredient.objects.create(
+                name=f"Ингредиент {number}", measurement_unit="г"
+            )
+            for number in range(4)
+        ]
+        self.recipes = []
+        for number in range(3):
+            recipe = Recipe.objects.create(
+                author=author, name=f"Рецепт {number}", cooking_time=5
+            )
+            for ingredient in self.ingredients[number:number + 2]:
+                IngredientRecipe.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=1
+                )
+            self.recipes.append(recipe)
+        self.index = RecipeIngredientIndex()
+        self.index.get()
+
+    def assertUpToDate(self):
+        self.index._checked_at = 0.0
+        with mock.patch.object(
+            self.index, "build", side_effect=AssertionError("rebuild")
+        ):
+            data = self.index.get()
+        self.assertEqual(data, self.index.build())
+
+    def test_recipe_ingredients_changed(self):
+        first, second, _ = self.recipes
+        with self.captureOnCommitCallbacks(execute=True):
+            IngredientRecipe.objects.filter(recipe=first).delete()
+            IngredientRecipe.objects.create(
+                recipe=first, ingredient=self.ingredients[3], amount=1
+            )
+            IngredientRecipe.objects.create(
+                recipe=second, ingredient=self.ingredients[0], amount=1
+            )
+        self.assertUpToDate()
+
+    def test_recipe_deleted(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipes[1].delete()
+        self.assertUpToDate()
+        self.assertNotIn(self.recipes[1].pk, self.index.get()["totals"])
+
+    def test_lost_changes_rebuild_index(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipes[0].delete()
+        cache.delete(self.index.change_key(self.index.current_position()))
+        self.index._checked_at = 0.0
+        self.assertEqual(self.index.get(), self.index.build())
+
+
+class RecipeAuthorTest(TestCase):
+    """Смена автора рецепта переносит его в счетчик нового автора."""
+    def setUp(self):
+        self.first = User.objects.create_user(
+            username="first", email="first@example.com"
+        )
+        self.second = User.objects.create_user(
+            username="second", email="second@example.com"
+        )
+        Recipe.objects.create(
+            author=self.first, name="Борщ", cooking_time=5
+        )
+        self.recipe = Recipe.objects.get()
+
+    def assertRecipesCount(self, first, second):
+        for user, count in ((self.first, first), (self.second, second)):
+            user.refresh_from_db()
+            self.assertEqual(user.recipes_count, count)
+
+    def test_author_changed(self):
+        self.recipe.author = self.second
+        self.recipe.save()
+        self.assertRecipesCount(0, 1)
+        # Повторное сохранение не меняет счетчики еще раз.
+        self.recipe.save()
+        self.assertRecipesCount(0, 1)
+
+    def test_save_does_not_read_author(self):
+        self.recipe.name = "Щи"
+        with CaptureQueriesContext(connection) as queries:
+            self.recipe.save()
+        self.assertFalse(
+            [
+                query["sql"] for query in queries
+                if query["sql"].startswith("SELECT")
+            ]
+        )
+
+
+class SimilarRecipesMixin:
+    """Рецепты: два одинаковых, один с общим ингредиентом и один без."""
+    def setUp(self):
+        author = User.objects.create_user(
+            username="author", email="author@example.com"
+        )
+        soup = Tag.objects.create(name="Суп", color="#000000", slug="soup")
+        self.ingredients = [
+            Ingredient.objects.create(
+                name=f"Ингредиент {number}", measurement_unit="г"
+            )
+            for number in range(4)
+        ]
+        self.recipes = []
+        for number, ingredients in enumerate(((0, 1), (0, 1), (0, 2), (3,))):
+            recipe = Recipe.objects.create(
+                author=author, name=f"Рецепт {number}", cooking_time=5
+            )
+            if number < 2:
+                TagRecipe.objects.create(recipe=recipe, tag=soup)
+            for ingredient in ingredients:
+                IngredientRecipe.objects.create(
+                    recipe=recipe,
+                    ingredient=self.ingredients[ingredient],
+                    amount=1,
+                )
+            self.recipes.append(recipe)
+        similarity.rebuild()
+
+    def similar_ids(self, recipe):
+        return list(
+            SimilarRecipe.objects.filter(recipe=recipe)
+            .order_by("-score", "-similar_id")
+            .values_list("similar_id", flat=True)
+        )
+
+
+class SimilarityTest(SimilarRecipesMixin, TestCase):
+    """Похожие рецепты пересчитываются целиком и по отметкам."""
+    def test_rebuild(self):
+        first, second, third, fourth = self.recipes
+        self.assertEqual(self.similar_ids(first), [second.pk, third.pk])
+        self.assertEqual(self.similar_ids(fourth), [])
+        self.assertFalse(StaleSimilarRecipe.objects.exists())
+
+    def test_ingredient_change_marks_recipe_stale(self):
+        fourth = self.recipes[3]
+        IngredientRecipe.objects.create(
+            recipe=fourth, ingredient=self.ingredients[0], amount=1
+        )
+        self.assertEqual(
+            list(StaleSimilarRecipe.objects.values_list("pk", flat=True)),
+            [fourth.pk],
+        )
+
+    def test_update_stale(self):
+        first, second, third, fourth = self.recipes
+        IngredientRecipe.objects.create(
+            recipe=fourth, ingredient=self.ingredients[2], amount=1
+        )
+        similarity.mark_stale([fourth.pk])
+        self.assertEqual(similarity.update_stale(), 1)
+        self.assertFalse(StaleSimilarRecipe.objects.exists())
+        self.assertEqual(self.similar_ids(fourth), [third.pk])
+        self.assertIn(fourth.pk, self.similar_ids(third))
+
+    def test_rebuild_keeps_marks_made_during_it(self):
+        load_sets = similarity.load_sets
+
+        def load_and_mark(*args, **kwargs):
+            similarity.mark_stale([self.recipes[3].pk])
+            return load_sets(*args, **kwargs)
+
+        with mock.patch.object(similarity, "load_sets", load_and_mark):
+            similarity.rebuild()
+        self.assertTrue(
+            StaleSimilarRecipe.objects.filter(pk=self.recipes[3].pk).exists()
+        )
+
+
+class RecipeSearchTest(TestCase):
+    """Поиск по инвертированному индексу TF-IDF (СУБД без tsvector)."""
+    def setUp(self):
+        cache.clear()
+        recipe_search_index._checked_at = 0.0
+        author = User.objects.create_user(
+            username="author", email="author@example.com"
+        )
+        self.borscht, self.shchi, self.salad = (
+            Recipe.objects.create(
+                author=author, name=name, text=text, cooking_time=5
+            )
+            for name, text in (
+                ("Борщ украинский", "Свекла и капуста."),
+                ("Щи", "Капуста, как в борще, но без свеклы."),
+                ("Салат", "Огурцы и помидоры."),
+            )
+        )
+
+    def search(self, query):
+        return list(search_recipes(Recipe.objects.all(), query))
+
+    def test_name_ranks_above_text(self):
+        self.assertEqual(self.search("борщ"), [self.borscht, self.shchi])
+
+    def test_word_forms(self):
+        # При равной релевантности новые рецепты идут первыми.
+        self.assertEqual(
+            self.search("капусту свеклу"), [self.shchi, self.borscht]
+        )
+
+    def test_all_words_required(self):
+        self.assertEqual(self.search("борщ огурцы"), [])
+
+    def test_empty_result(self):
+        for query in ("", "и", "пельмени"):
+            with self.subTest(query=query):
+                self.assertEqual(self.search(query), [])
+
+    @override_settings(RECIPE_SEARCH_FALLBACK_LIMIT=1)
+    def test_limit(self):
+        self.assertEqual(self.search("борщ"), [self.borscht])
+
+    def test_index_follows_changes(self):
+        self.assertEqual(self.search("салат"), [self.salad])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.salad.name = "Винегрет"
+            self.salad.save()
+        self.assertEqual(self.search("салат"), [])
+        self.assertEqual(self.search("винегрет"), [self.salad])
+
+    def test_api(self):
+        response = self.client.get("/api/recipes/", {"search": "борщ"})
+        self.assertEqual(
+            [recipe["id"] for recipe in response.json()["results"]],
+            [self.borscht.pk, self.shchi.pk],
+        )
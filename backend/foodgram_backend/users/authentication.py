@@ -0,0 +1,121 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from core import metrics
+
+User = get_user_model()
+
+
+class LocalTTLCache:
+    """Ограниченный по размеру LRU-кеш процесса с временем жизни записей."""
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class TokenCache:
+    """Кеш соответствия токена пользователю.
+
+    Сначала проверяется локальный кеш процесса с коротким временем жизни,
+    затем, если включено, общий кеш. В общем кеше хранится только id
+    пользователя, а сам пользователь читается из базы процессом, поэтому
+    хеш пароля не попадает в общий кеш. Удаление записи из общего кеша
+    становится видно другим процессам не позже TOKEN_CACHE_LOCAL_TTL.
+    """
+    def __init__(self):
+        self.local = LocalTTLCache(
+            settings.TOKEN_CACHE_SIZE, settings.TOKEN_CACHE_LOCAL_TTL
+        )
+        self.stats = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def shared_key(key):
+        return f"auth-token:{key}"
+
+    def get(self, key):
+        token = self.local.get(key)
+        if token is None and settings.TOKEN_CACHE_SHARED:
+            token = self.get_shared(key)
+            if token is not None:
+                self.local.set(key, token)
+        self.stats["hits" if token is not None else "misses"] += 1
+        found = int(token is not None)
+        metrics.observe_cache("tokens", found, 1 - found)
+        return token
+
+    def get_shared(self, key):
+        user_id = cache.get(self.shared_key(key))
+        if user_id is None:
+            return None
+        user = User.objects.filter(pk=user_id).first()
+        if user is None:
+            return None
+        return Token(key=key, user=user)
+
+    def set(self, key, token):
+        self.local.set(key, token)
+        if settings.TOKEN_CACHE_SHARED:
+            cache.set(
+                self.shared_key(key), token.user_id, settings.TOKEN_CACHE_TTL
+            )
+
+    def delete(self, key):
+        self.local.delete(key)
+        if settings.TOKEN_CACHE_SHARED:
+            cache.delete(self.shared_key(key))
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Аутентификация по токену без запроса к базе для известных токенов.
+
+    Активность пользователя проверяется и для токенов из кеша.
+    """
+    def authenticate_credentials(self, key):
+        token = token_cache.get(key)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, token)
+            return user, token
+        if not token.user.is_active:
+            token_cache.delete(key)
+            raise exceptions.AuthenticationFailed(
+                _("User inactive or deleted.")
+            )
+        return token.user, token
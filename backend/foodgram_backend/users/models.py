@@ -1,6 +1,7 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from core.models import CountersMixin
 from core.validators import validate_username
 
 ROLE_LENGTH = 30
@@ -12,9 +13,10 @@ USERS_ROLES = (
 )
 
 
-class User(AbstractUser):
+class User(CountersMixin, AbstractUser):
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["username", "first_name", "last_name", "password"]
+    counter_fields = ("recipes_count", "followers_count")
     username = models.CharField(
         validators=(validate_username,),
         max_length=USERNAME_LENGTH,
@@ -37,6 +39,12 @@ class User(AbstractUser):
     last_name = models.CharField(
         max_length=USERNAME_LENGTH, blank=True, verbose_name="Фамилия"
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Количество рецептов"
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Количество подписчиков"
+    )
 
     @property
     def is_admin(self):
@@ -21,3 +21,12 @@ class IsAdminOrOwner(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.user.is_authenticated:
             return request.user.is_admin or (request.user == obj)
+
+
+class IsAdmin(permissions.BasePermission):
+    """
+    Права доступа только у админа.
+    """
+
+    def has_permission(self, request, view):
+        return request.user.is_authenticated and request.user.is_admin
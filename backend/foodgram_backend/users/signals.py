@@ -0,0 +1,25 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from users.authentication import token_cache
+
+User = get_user_model()
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    token_cache.delete(instance.key)
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, update_fields, **kwargs):
+    # Смена пароля, деактивация и другие изменения пользователя
+    # сбрасывают закешированные токены, кроме обновления last_login.
+    if created or update_fields == frozenset(("last_login",)):
+        return
+    for key in Token.objects.filter(user=instance).values_list(
+        "key", flat=True
+    ):
+        token_cache.delete(key)
@@ -0,0 +1,128 @@
+from django.core.cache import cache
+from django.db.models import F
+from django.db.models.signals import pre_save
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Follow, Recipe
+from users.authentication import token_cache
+from users.models import User
+
+
+class CountersTest(TestCase):
+    """Сохранение пользователя не затирает денормализованные счетчики."""
+    def setUp(self):
+        self.author = User.objects.create_user(
+            username="author", email="author@example.com", password="old-pass"
+        )
+        self.follower = User.objects.create_user(
+            username="follower", email="follower@example.com"
+        )
+        # Объект прочитан до того, как счетчики изменились.
+        self.stale_author = User.objects.get(pk=self.author.pk)
+        for number in range(2):
+            Recipe.objects.create(
+                author=self.author, name=f"Рецепт {number}", cooking_time=5
+            )
+        Follow.objects.create(user=self.follower, following=self.author)
+        self.client = APIClient()
+        self.client.force_authenticate(self.stale_author)
+
+    def assertCounters(self):
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 2)
+        self.assertEqual(self.author.followers_count, 1)
+
+    def test_set_password(self):
+        response = self.client.post(
+            "/api/users/set_password/",
+            {"current_password": "old-pass", "new_password": "N3w-pass-42"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 204, response.content)
+        self.assertCounters()
+        self.assertTrue(self.author.check_password("N3w-pass-42"))
+
+    def test_profile_edit(self):
+        def concurrent_recipe(sender, instance, **kwargs):
+            # Рецепт создан в другом запросе после чтения пользователя.
+            User.objects.filter(pk=instance.pk).update(
+                recipes_count=F("recipes_count") + 1
+            )
+
+        pre_save.connect(concurrent_recipe, sender=User)
+        try:
+            response = self.client.patch(
+                f"/api/users/{self.author.pk}/",
+                {"first_name": "Иван"},
+                format="json",
+            )
+        finally:
+            pre_save.disconnect(concurrent_recipe, sender=User)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 3)
+        self.assertEqual(self.author.first_name, "Иван")
+
+    def test_plain_save(self):
+        self.stale_author.last_name = "Иванов"
+        self.stale_author.save()
+        self.assertCounters()
+
+    def test_explicit_update_fields(self):
+        self.stale_author.save(update_fields=["recipes_count"])
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 0)
+
+
+class TokenCacheTest(TestCase):
+    """Закешированный токен перестает действовать вместе с настоящим."""
+    def setUp(self):
+        cache.clear()
+        token_cache.local = type(token_cache.local)(
+            token_cache.local.maxsize, token_cache.local.ttl
+        )
+        self.user = User.objects.create_user(
+            username="user", email="user@example.com", password="old-pass"
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        self.assertMe(200)
+
+    def assertMe(self, status_code):
+        response = self.client.get("/api/users/me/")
+        self.assertEqual(response.status_code, status_code, response.content)
+
+    def test_shared_cache_keeps_only_user_id(self):
+        self.assertEqual(
+            cache.get(token_cache.shared_key(self.token.key)), self.user.pk
+        )
+        token_cache.local.delete(self.token.key)
+        self.assertMe(200)
+
+    def test_logout(self):
+        response = self.client.post("/api/auth/token/logout/")
+        self.assertEqual(response.status_code, 204, response.content)
+        self.assertMe(401)
+
+    def test_set_password(self):
+        response = self.client.post(
+            "/api/users/set_password/",
+            {"current_password": "old-pass", "new_password": "N3w-pass-42"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 204, response.content)
+        self.assertMe(401)
+
+    def test_deactivated(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertMe(401)
+
+    def test_deactivated_in_other_process(self):
+        # Другой процесс не сбросил запись в общем кеше.
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        token_cache.local.delete(self.token.key)
+        self.assertMe(401)